@@ -3,21 +3,14 @@
 import logging
 import os
 import random
-
-import serial
-from functools import reduce
-
-try:
-    from queue import Queue, Empty
-except ImportError:
-    from Queue import Queue, Empty
+import struct
 
 
 REPORT_TIME = 2.0
 
 READ_DATA_COMMAND = b'\x53\x01\x01\x85'
 CHANGE_GAIN_COMMAND = b'\x53\x01\x07\x91'
-START_BYTE = b'\x53'
+START_BYTE = 0x53
 
 CHANGE_GAIN_OK = b'\x00'
 CHANGE_GAIN_ERROR = b'\xFF'
@@ -25,12 +18,17 @@ CHANGE_GAIN_ERROR = b'\xFF'
 DATA_ANSWER, GAIN_ANSWER = range(2)
 
 PACKET_LENGTH = 8
+# Data answer: start byte, type, signal (u16 LE), temperature (u16 LE),
+# gain (u8), checksum (u8).
+DATA_PACKET = struct.Struct('<xxHHBB')
 
 K_KOEFF = 0.01
 GAIN = 1
 SERIAL_PORT = '/dev/serial/by-path/pci-0000:00:1d.0-usb-0:1.2:1.0-port0'
 SERIAL_BAUD = 115200
 SERIAL_TIMER = 0.1
+# Number of serial timer ticks between two radiometer samples.
+SAMPLE_TICKS = int(round(REPORT_TIME / SERIAL_TIMER))
 
 GAIN_CHOICE = {x: x for x in (1, 2, 4, 8)}
 
@@ -40,19 +38,8 @@ SERIAL_BAUD_CHOICE = {x: x for x in (
 )}
 
 
-def get_data_from_queue(queue):
-    data = b''
-    while not queue.empty():
-        try:
-            data = queue.get_nowait()
-        except Empty:
-            pass
-    return data
-
-
 def check_crc(data):
-    buffer_sum = reduce(lambda a, b: a + b, data).to_bytes(4, 'big')
-    return buffer_sum[-1]
+    return sum(data) & 0xFF
 
 
 class Radiometer:
@@ -69,12 +56,12 @@ class Radiometer:
         self.max_temp = 0.0
 
         self.serial = None
-        self.main_timer = None
-        self.read_timer = None
-        self.read_buffer = b''
-        self.read_queue = Queue()
-        self.write_timer = None
-        self.write_queue = Queue()
+        self.serial_timer = None
+        self.sample_tick = 0
+        self.read_buffer = bytearray()
+        # Single-slot mailboxes: only the latest packet/command is kept.
+        self.latest_read = None
+        self.latest_write = None
 
         self.answer_length = 0
         self.answer_type = DATA_ANSWER
@@ -86,12 +73,7 @@ class Radiometer:
         self.serial_baud = config.getchoice(
             'serial_baud', choices=SERIAL_BAUD_CHOICE, default=SERIAL_BAUD
         )
-        self.serial_baud = config.getint(
-            'serial_baud', default=self.serial_baud
-        )
-
         self.gain = config.getchoice('gain', choices=GAIN_CHOICE, default=GAIN)
-        self.gain = config.get('gain', self.gain)
 
         if self.printer.get_start_args().get('debugoutput') is not None:
             return
@@ -102,8 +84,7 @@ class Radiometer:
         )
 
     # def handle_connect(self):
-    #     self.reactor.update_timer(self.read_timer, self.reactor.NOW)
-    #     self.reactor.update_timer(self.write_timer, self.reactor.NOW)
+    #     self.reactor.update_timer(self.serial_timer, self.reactor.NOW)
 
     def setup_minmax(self, min_temp, max_temp):
         self.min_temp = min_temp
@@ -116,24 +97,18 @@ class Radiometer:
         return REPORT_TIME
 
     def _connect(self):
-        with self.write_queue.mutex:
-            self.write_queue.queue.clear()
-        with self.read_queue.mutex:
-            self.read_queue.queue.clear()
+        self.latest_read = self.latest_write = None
 
+        # import serial
         # self.serial = serial.Serial(
         #     self.serial_port, self.serial_baud, timeout=0, write_timeout=0
         # )
 
-        self.main_timer = self.reactor.register_timer(
-            self._sample_radiometer, self.reactor.NOW
-        )
-
-        self.read_timer = self.reactor.register_timer(
-            self._read_serial, self.reactor.NOW
-        )
-        self.write_timer = self.reactor.register_timer(
-            self._write_serial, self.reactor.NOW
+        # A single timer services the serial port and, every SAMPLE_TICKS
+        # ticks, samples the radiometer.
+        self.sample_tick = 0
+        self.serial_timer = self.reactor.register_timer(
+            self._serial_event, self.reactor.NOW
         )
 
     def _f_temp(self):
@@ -141,18 +116,27 @@ class Radiometer:
         return 0.00001 * self.temp
 
     def _decode_data(self, data):
-        # if data[7] == check_crc(data[:7]):
+        sig_raw, temp_raw, gain, crc = DATA_PACKET.unpack_from(data)
+        # if crc == check_crc(data[:7]):
         if True:
-            self.temp = self.k_koeff * (data[4] | data[5] << 8)
-            self.sig = self._f_temp() * (data[2] | data[3] << 8)
-            self.gain = data[6]
+            self.temp = self.k_koeff * temp_raw
+            self.sig = self._f_temp() * sig_raw
+            self.gain = gain
         else:
             logging.warning('Checksum error while serial reading.')
 
-    def _sample_radiometer(self, eventtime):
-        self.write_queue.put(READ_DATA_COMMAND)
+    def _serial_event(self, eventtime):
+        if not self.sample_tick:
+            self._sample_radiometer()
+        self.sample_tick = (self.sample_tick + 1) % SAMPLE_TICKS
+        self._write_serial()
+        self._read_serial()
+        return eventtime + SERIAL_TIMER
+
+    def _sample_radiometer(self):
+        self.latest_write = READ_DATA_COMMAND
 
-        data = get_data_from_queue(self.read_queue)
+        data, self.latest_read = self.latest_read, None
         if data:
             self._decode_data(data)
             # self.gcode.respond_info(
@@ -167,14 +151,12 @@ class Radiometer:
         measured_time = self.reactor.monotonic()
         self._callback(mcu.estimated_print_time(measured_time), self.sig)
 
-        return measured_time + REPORT_TIME
-
-    def _write_serial(self, eventtime):
-        data = get_data_from_queue(self.write_queue)
-        # self.serial.write(data)
-        return eventtime + SERIAL_TIMER
+    def _write_serial(self):
+        data, self.latest_write = self.latest_write, None
+        # if data:
+        #     self.serial.write(data)
 
-    def _read_serial(self, eventtime):
+    def _read_serial(self):
         # try:
         #    self.file_handle.seek(0)
         #    self.temp = float(self.file_handle.read())/1000.0
@@ -192,24 +174,13 @@ class Radiometer:
         #        "HOST temperature %0.1f above maximum temperature of %0.1f."
         #        % (self.temp, self.max_temp,))
 
-        while True:
-            # self.read_buffer += self.serial.read()
-            self.read_buffer += os.urandom(1)
-
-            if len(self.read_buffer):
-                if len(self.read_buffer) == PACKET_LENGTH:
-                    self.read_queue.put(self.read_buffer)
-                    self.read_buffer = b''
-                    break
-            else:
-                break
-
-        # self.read_buffer += self.serial.read()
-        # if len(self.read_buffer) == PACKET_LENGTH:
-        #     self.read_queue.put(self.read_buffer)
-        #     self.read_buffer = b''
-
-        return eventtime + SERIAL_TIMER
+        read_buffer = self.read_buffer
+        need = PACKET_LENGTH - len(read_buffer)
+        # read_buffer.extend(self.serial.read(need))
+        read_buffer.extend(os.urandom(need))
+        if len(read_buffer) >= PACKET_LENGTH:
+            self.latest_read = bytes(read_buffer[:PACKET_LENGTH])
+            del read_buffer[:PACKET_LENGTH]
 
     def get_status(self, eventtime):
         return {
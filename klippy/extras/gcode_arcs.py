@@ -8,6 +8,11 @@
 # This file may be distributed under the terms of the GNU GPLv3 license.
 import math
 
+# Number of incrementally rotated segments before the radius vector is
+# recomputed with exact trig to bound accumulated rounding error (the
+# value matches Marlin's N_ARC_CORRECTION).
+ARC_CORRECTION = 25
+
 # Coordinates created by this are converted into G1 commands.
 #
 # supports XY, XZ & YZ planes with remaining axis as helical
@@ -24,8 +29,8 @@ class ArcSupport:
         #   the configured value will become straight lines. The default is
         #   1 mm.
 
-        To start adding support for multi-axis, this reads the 'axis' parameter
-        of the '[printer]' section in the config file:
+        To start adding support for multi-axis, this uses the 'axis' parameter
+        of the '[printer]' section in the config file (as parsed by gcode_move):
         [printer]
         # ...
         axis: XYZ  # Optional: XYZ or XYZABC
@@ -39,8 +44,9 @@ class ArcSupport:
         
         # Get amount of axes
         # NOTE: Amount of non-extruder axes: XYZ=3, XYZABC=6.
-        self.axis_names = config.getsection("printer").get('axis', 'XYZ')  # "XYZ" / "XYZABC"
-        self.axis_count = len(self.axis_names)
+        # NOTE: gcode_move has already read these from the '[printer]' section.
+        self.axis_names = self.gcode_move.axis_names  # "XYZ" / "XYZABC"
+        self.axis_count = self.gcode_move.axis_count
 
         # Enum
         self.ARC_PLANE_X_Y = 0
@@ -52,6 +58,13 @@ class ArcSupport:
         self.Y_AXIS = 1
         self.Z_AXIS = 2
         self.E_AXIS = self.axis_count  # NOTE: Not used below.
+
+        # Offset parameter letters and (alpha, beta, helical) axes per plane.
+        self.plane_table = {
+            self.ARC_PLANE_X_Y: ('I', 'J', (self.X_AXIS, self.Y_AXIS, self.Z_AXIS)),
+            self.ARC_PLANE_X_Z: ('I', 'K', (self.X_AXIS, self.Z_AXIS, self.Y_AXIS)),
+            self.ARC_PLANE_Y_Z: ('J', 'K', (self.Y_AXIS, self.Z_AXIS, self.X_AXIS)),
+        }
         
         # Arc Move Clockwise.
         self.gcode.register_command("G2", self.cmd_G2)
@@ -67,6 +80,9 @@ class ArcSupport:
         # This is a named tuple with elements: ('x', 'y', 'z', 'e', 'a', 'b', 'c')
         # Values default to None.
         self.Coord = self.gcode.Coord
+        # Template for the per-segment coordinate list (axes plus extruder).
+        self.coord_len = self.axis_count + 1
+        self.coord_template = [None] * self.coord_len
 
         # backwards compatibility, prior implementation only supported XY
         self.plane = self.ARC_PLANE_X_Y
@@ -97,6 +113,7 @@ class ArcSupport:
         if not gcodestatus['absolute_coordinates']:
             raise gcmd.error("G2/G3 does not support relative move mode")
         currentPos = gcodestatus['gcode_position']
+        absolute_extrude = gcodestatus['absolute_extrude']
 
         # Parse parameters
         asTarget = self.Coord(x=gcmd.get_float("X", currentPos[0]),
@@ -108,45 +125,30 @@ class ArcSupport:
             raise gcmd.error("G2/G3 does not support R moves")
 
         # determine the plane coordinates and the helical axis
-        asPlanar = [ gcmd.get_float(a, 0.) for i,a in enumerate('IJ') ]
-        axes = (self.X_AXIS, self.Y_AXIS, self.Z_AXIS)
-        if self.plane == self.ARC_PLANE_X_Z:
-            asPlanar = [ gcmd.get_float(a, 0.) for i,a in enumerate('IK') ]
-            axes = (self.X_AXIS, self.Z_AXIS, self.Y_AXIS)
-        elif self.plane == self.ARC_PLANE_Y_Z:
-            asPlanar = [ gcmd.get_float(a, 0.) for i,a in enumerate('JK') ]
-            axes = (self.Y_AXIS, self.Z_AXIS, self.X_AXIS)
+        alpha_letter, beta_letter, axes = self.plane_table[self.plane]
+        asPlanar = (gcmd.get_float(alpha_letter, 0.),
+                    gcmd.get_float(beta_letter, 0.))
 
         if not (asPlanar[0] or asPlanar[1]):
             raise gcmd.error("G2/G3 requires IJ, IK or JK parameters")
 
         asE = gcmd.get_float("E", None)
-        asF = gcmd.get_float("F", None)
+        asF = gcmd.get_float("F", None, above=0.)
 
         # Build list of linear coordinates to move
-        coords = self.planArc(currentPos=currentPos, 
-                              targetPos=asTarget, 
-                              offset=asPlanar,
-                              clockwise=clockwise,
+        # NOTE: positional arguments, keywords before "*axes" would
+        #       bind "axes" to "currentPos" and the following arguments.
+        coords = self.planArc(currentPos, asTarget, asPlanar, clockwise,
                               # Expand the axes list to pass its values to: "alpha_axis", "beta_axis", "helical_axis"
                               *axes)
         e_per_move = e_base = 0.
         if asE is not None:
-            if gcodestatus['absolute_extrude']:
+            if absolute_extrude:
                 e_base = currentPos[3]
             e_per_move = (asE - e_base) / len(coords)
 
-        # Convert coords into G1 commands
-        for coord in coords:
-            g1_params = {'X': coord[0], 'Y': coord[1], 'Z': coord[2]}
-            if e_per_move:
-                g1_params['E'] = e_base + e_per_move
-                if gcodestatus['absolute_extrude']:
-                    e_base += e_per_move
-            if asF is not None:
-                g1_params['F'] = asF
-            g1_gcmd = self.gcode.create_gcode_command("G1", "G1", g1_params)
-            self.gcode_move.cmd_G1(g1_gcmd)
+        # Move through the coords directly instead of one G1 per segment
+        self.gcode_move.move_gcode_segments(gcmd, coords, e_per_move, asF)
 
     # function planArc() originates from marlin plan_arc()
     # https://github.com/MarlinFirmware/Marlin
@@ -185,37 +187,51 @@ class ArcSupport:
 
         # Determine number of segments
         linear_travel = targetPos[helical_axis] - currentPos[helical_axis]
-        radius = math.hypot(r_P, r_Q)
-        flat_mm = radius * angular_travel
+        r2 = r_P * r_P + r_Q * r_Q
         if linear_travel:
-            mm_of_travel = math.hypot(flat_mm, linear_travel)
+            mm_of_travel = math.sqrt(r2 * angular_travel * angular_travel
+                                     + linear_travel * linear_travel)
         else:
-            mm_of_travel = math.fabs(flat_mm)
-        segments = max(1., math.floor(mm_of_travel / self.mm_per_arc_segment))
+            mm_of_travel = math.sqrt(r2) * math.fabs(angular_travel)
+        if mm_of_travel < self.mm_per_arc_segment:
+            # Arc is shorter than a single segment - move in a line
+            return [targetPos]
+        # Integer segment count, at least 1 due to the check above
+        segments = int(mm_of_travel / self.mm_per_arc_segment)
 
         # Generate coordinates
         theta_per_segment = angular_travel / segments
         linear_per_segment = linear_travel / segments
-        coords = []
-        for i in range(1, int(segments)):
-            dist_Helical = i * linear_per_segment
-            cos_Ti = math.cos(i * theta_per_segment)
-            sin_Ti = math.sin(i * theta_per_segment)
-            r_P = -offset[0] * cos_Ti + offset[1] * sin_Ti
-            r_Q = -offset[0] * sin_Ti - offset[1] * cos_Ti
-
-            # Coord is a named tuple with elements: ('x', 'y', 'z', 'e', 'a', 'b', 'c')
-            # Its values default to None.
-            # Coord doesn't support index assignment, create list.
+        # The radius vector is advanced with a small-angle rotation per
+        # segment instead of evaluating cos/sin at every step.
+        off_P, off_Q = offset[0], offset[1]
+        helical_start = currentPos[helical_axis]
+        coord_template = self.coord_template
+        cos_T = math.cos(theta_per_segment)
+        sin_T = math.sin(theta_per_segment)
+        coords = [None] * segments
+        for i in range(1, segments):
+            if i % ARC_CORRECTION:
+                r_P, r_Q = (r_P * cos_T - r_Q * sin_T,
+                            r_P * sin_T + r_Q * cos_T)
+            else:
+                cos_Ti = math.cos(i * theta_per_segment)
+                sin_Ti = math.sin(i * theta_per_segment)
+                r_P = -off_P * cos_Ti + off_Q * sin_Ti
+                r_Q = -off_P * sin_Ti - off_Q * cos_Ti
+
+            # Intermediate points are plain index-addressed lists with the
+            # same layout as Coord (axes plus extruder, unset values None);
+            # consumers only read them by index, so no Coord is built.
             # NOTE: Using "axis_count" (e.g. can be "3" for an XYZ setup). Adding 1 to consider the Extruder axis. 
             #       This achieves backwardcompatibility.
-            c = [None for i in range(self.axis_count + 1)]
+            c = coord_template[:]
             c[alpha_axis] = center_P + r_P
             c[beta_axis] = center_Q + r_Q
-            c[helical_axis] = currentPos[helical_axis] + dist_Helical
-            coords.append(self.Coord(*c))
+            c[helical_axis] = helical_start + i * linear_per_segment
+            coords[i - 1] = c
 
-        coords.append(targetPos)
+        coords[-1] = targetPos
         return coords
 
 def load_config(config):
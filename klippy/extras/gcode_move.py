@@ -3,10 +3,21 @@
 # Copyright (C) 2016-2021  Kevin O'Connor <kevin@koconnor.net>
 #
 # This file may be distributed under the terms of the GNU GPLv3 license.
-import logging, klippy
+import logging, operator, sys, klippy
 from gcode import GCodeDispatch
 from extras.homing import Homing
 
+class GCodeState:
+    # Snapshot stored by SAVE_GCODE_STATE. Instances are kept per state
+    # name and overwritten in place when that name is saved again.
+    __slots__ = ('absolute_coord', 'absolute_extrude', 'base_position',
+                 'last_position', 'homing_position', 'speed',
+                 'speed_factor', 'extrude_factor')
+    def __init__(self, axis_count):
+        self.base_position = [0.0] * (axis_count + 1)
+        self.last_position = [0.0] * (axis_count + 1)
+        self.homing_position = [0.0] * (axis_count + 1)
+
 class GCodeMove:
     """Main GCodeMove class.
 
@@ -24,17 +35,23 @@ class GCodeMove:
       - The "checks" still have the XYZ logic.
       - Homing is not implemented for ABC.
     """
+    # G-Code commands handled by the "cmd_<name>" methods below.
+    HANDLERS = (
+        'G1', 'G20', 'G21',
+        'M82', 'M83', 'G90', 'G91', 'G92', 'M220', 'M221',
+        'SET_GCODE_OFFSET', 'SAVE_GCODE_STATE', 'RESTORE_GCODE_STATE',
+    )
     def __init__(self, config, toolhead_id="toolhead"):
         self.toolhead_id = toolhead_id
         
         # NOTE: amount of non-extruder axes: XYZ=3, XYZABC=6.
-        # TODO: cmd_M114 only supports 3 or 6 for now.
         # TODO: find a way to get the axis value from the config, this does not work.
         # self.axis_names = config.get('axis', 'XYZABC')  # "XYZ" / "XYZABC"
         # self.axis_names = kwargs.get("axis", "XYZ")  # "XYZ" / "XYZABC"
         main_config = config.getsection("printer")
         self.axis_names = main_config.get('axis', 'XYZ')
         self.axis_count = len(self.axis_names)
+        self._setup_axis_lookups()
         
         logging.info(f"\n\nGCodeMove: starting setup with axes: {self.axis_names}\n\n")
         
@@ -59,14 +76,9 @@ class GCodeMove:
         
         # Register g-code commands
         gcode: GCodeDispatch = printer.lookup_object('gcode')
-        handlers = [
-            'G1', 'G20', 'G21',
-            'M82', 'M83', 'G90', 'G91', 'G92', 'M220', 'M221',
-            'SET_GCODE_OFFSET', 'SAVE_GCODE_STATE', 'RESTORE_GCODE_STATE',
-        ]
         # NOTE: this iterates over the commands above and finds the functions
-        #       and description strings by their names (as they appear in "handlers").
-        for cmd in handlers:
+        #       and description strings by their names (as they appear in "HANDLERS").
+        for cmd in self.HANDLERS:
             func = getattr(self, 'cmd_' + cmd)
             desc = getattr(self, 'cmd_' + cmd + '_help', None)
             gcode.register_command(cmd, func, when_not_ready=False, desc=desc)
@@ -89,6 +101,7 @@ class GCodeMove:
         #       which contrasts with the usual "mm/sec" unit
         #       used throughout Klipper.
         self.speed_factor = 1. / 60.
+        self.inv_speed_factor = 60.
         self.extrude_factor = 1.
         
         # G-Code state
@@ -97,7 +110,18 @@ class GCodeMove:
         # NOTE: Default function for "position_with_transform", 
         #       overriden later on by "_handle_ready" (which sets
         #       toolhead.get_position) or "set_move_transform".
-        self.position_with_transform = (lambda: [0.0 for i in range(self.axis_count + 1)])
+        zero_position = [0.0] * (self.axis_count + 1)
+        self.position_with_transform = (lambda: list(zero_position))
+    
+    def _setup_axis_lookups(self):
+        # Axis name tables used by the g-code handlers, built once from
+        # "axis_names" (the extruder is the last position, after the axes).
+        self.axis_keyset = frozenset(self.axis_names)
+        self.axis_index = {axis: pos for pos, axis in enumerate(self.axis_names)}
+        self.axis_names_e = self.axis_names + 'E'
+        self.axis_enum_e = tuple(enumerate(self.axis_names_e))
+        self.m114_format = " ".join(["%s:%%.3f" % (a,)
+                                     for a in self.axis_names_e])
     
     def _handle_ready(self):
         self.is_printer_ready = True
@@ -143,8 +167,10 @@ class GCodeMove:
     
     def _handle_home_rails_end(self, homing_state: Homing, rails):
         self.reset_last_position()
+        base_position = self.base_position
+        homing_position = self.homing_position
         for axis in homing_state.get_axes():
-            self.base_position[axis] = self.homing_position[axis]
+            base_position[axis] = homing_position[axis]
     
     def set_move_transform(self, transform, force=False):
         # NOTE: This method is called by bed_mesh, bed_tilt,
@@ -163,71 +189,74 @@ class GCodeMove:
         return old_transform
     
     def _get_gcode_position(self):
-        p = [lp - bp for lp, bp in zip(self.last_position, self.base_position)]
+        p = list(map(operator.sub, self.last_position, self.base_position))
         p[self.axis_count] /= self.extrude_factor
         return p
     
+    def _set_speed_factor(self, speed_factor):
+        # The reciprocal is kept alongside for _get_gcode_speed()
+        self.speed_factor = speed_factor
+        self.inv_speed_factor = 1. / speed_factor
+    
     def _get_gcode_speed(self):
-        return self.speed / self.speed_factor
+        return self.speed * self.inv_speed_factor
     
     def _get_gcode_speed_override(self):
         return self.speed_factor * 60.
     
     def get_status(self, eventtime=None):
         move_position = self._get_gcode_position()
+        Coord = self.Coord
         return {
             'speed_factor': self._get_gcode_speed_override(),
             'speed': self._get_gcode_speed(),
             'extrude_factor': self.extrude_factor,
             'absolute_coordinates': self.absolute_coord,
             'absolute_extrude': self.absolute_extrude,
-            'homing_origin': self.Coord(*self.homing_position),
-            'position': self.Coord(*self.last_position),
-            'gcode_position': self.Coord(*move_position),
+            'homing_origin': Coord(*self.homing_position),
+            'position': Coord(*self.last_position),
+            'gcode_position': Coord(*move_position),
         }
     
     def reset_last_position(self):
         # NOTE: Handler for "toolhead:set_position" and other events,
         #       sent at least by "toolhead.set_position" and also
         #       called by "_handle_activate_extruder" (and other methods).
-        logging.info("\n\n" + f"gcode_move.reset_last_position: triggered.\n\n")
         if self.is_printer_ready:
             # NOTE: The "" method is actually either "transform.get_position",
             #       "toolhead.get_position", or a default function returning "0.0" 
             #       for all axis.
             self.last_position = self.position_with_transform()
-            logging.info("\n\n" + f"gcode_move.reset_last_position: set self.last_position={self.last_position}\n\n")
-        else:
-            logging.info("\n\n" + f"gcode_move.reset_last_position: printer not ready self.last_position={self.last_position} not updated.\n\n")
+        logging.debug("reset_last_position: ready=%s last=%s",
+                      self.is_printer_ready, self.last_position)
     
     # G-Code movement commands
     def cmd_G1(self, gcmd):
         
         # Move
         params = gcmd.get_command_parameters()
-        logging.info(f"\n\nGCodeMove: G1 starting setup with params={params}.\n\n")
+        last_position = self.last_position
+        # NOTE: New positions are relative to the base coordinate position
+        #       in absolute mode and to the position of the last move in
+        #       relative mode, so pick the reference vector once.
+        if self.absolute_coord:
+            origin = self.base_position
+            e_origin = origin if self.absolute_extrude else last_position
+        else:
+            origin = e_origin = last_position
         try:
             # NOTE: XYZ(ABC) move coordinates.
-            for pos, axis in enumerate(self.axis_names):
-                if axis in params:
-                    v = float(params[axis])
-                    logging.info(f"\n\nGCodeMove: parsed axis={axis} with value={v}\n\n")
-                    if not self.absolute_coord:
-                        # value relative to position of last move
-                        self.last_position[pos] += v
-                    else:
-                        # value relative to base coordinate position
-                        self.last_position[pos] = v + self.base_position[pos]
+            axis_index = self.axis_index
+            axes = params.keys() & self.axis_keyset
+            for axis in axes:
+                pos = axis_index[axis]
+                last_position[pos] = float(params[axis]) + origin[pos]
             # NOTE: extruder move coordinates.
-            if 'E' in params:
+            has_e = 'E' in params
+            if has_e:
+                e_pos = self.axis_count
                 v = float(params['E']) * self.extrude_factor
-                logging.info(f"\n\nGCodeMove: parsed axis=E with value={v}\n\n")
-                if not self.absolute_coord or not self.absolute_extrude:
-                    # value relative to position of last move
-                    self.last_position[self.axis_count] += v
-                else:
-                    # value relative to base coordinate position
-                    self.last_position[self.axis_count] = v + self.base_position[self.axis_count]
+                last_position[e_pos] = v + e_origin[e_pos]
             # NOTE: move feedrate.
             if 'F' in params:
                 gcode_speed = float(params['F'])
@@ -243,8 +272,40 @@ class GCodeMove:
         # NOTE: send event to handlers, like "extra_toolhead.py" 
         self.printer.send_event("gcode_move:parsing_move_command", gcmd, params)
         
-        # NOTE: this is just a call to "toolhead.move".
-        self.move_with_transform(self.last_position, self.speed)
+        # NOTE: this is just a call to "toolhead.move". A G1 that only
+        #       sets the feedrate does not queue a (zero length) move.
+        if axes or has_e:
+            self.move_with_transform(self.last_position, self.speed)
+    
+    def move_gcode_segments(self, gcmd, coords, e_per_move=0., speed=None):
+        # Move through a series of absolute XYZ g-code positions without
+        # building a G1 command for each one (used by G2/G3 arcs).
+        # The caller must have validated that absolute coordinates are
+        # in use and that the (optional) speed is positive.
+        # NOTE: the segments do not go through "cmd_G1", the move event
+        #       is sent once for the whole command instead.
+        self.printer.send_event("gcode_move:parsing_move_command", gcmd,
+                                gcmd.get_command_parameters())
+        if speed is not None:
+            self.speed = speed * self.speed_factor
+        speed = self.speed
+        last_position = self.last_position
+        base_position = self.base_position
+        axis_index = self.axis_index
+        x_pos, y_pos, z_pos = axis_index['X'], axis_index['Y'], axis_index['Z']
+        base_x = base_position[x_pos]
+        base_y = base_position[y_pos]
+        base_z = base_position[z_pos]
+        e_index = self.axis_count
+        e_delta = e_per_move * self.extrude_factor
+        move_with_transform = self.move_with_transform
+        for coord in coords:
+            last_position[x_pos] = coord[0] + base_x
+            last_position[y_pos] = coord[1] + base_y
+            last_position[z_pos] = coord[2] + base_z
+            if e_delta:
+                last_position[e_index] += e_delta
+            move_with_transform(last_position, speed)
     
     # G-Code coordinate manipulation
     def cmd_G20(self, gcmd):
@@ -268,22 +329,22 @@ class GCodeMove:
     
     def cmd_G92(self, gcmd):
         # Set position
-        offsets = [ gcmd.get_float(a, None) for a in self.axis_names + 'E' ]
-        for i, offset in enumerate(offsets):
-            if offset is not None:
-                if i == self.axis_count:
-                    offset *= self.extrude_factor
-                self.base_position[i] = self.last_position[i] - offset
-        if offsets == [None, None, None, None]:
+        any_set = False
+        for i, a in self.axis_enum_e:
+            offset = gcmd.get_float(a, None)
+            if offset is None:
+                continue
+            any_set = True
+            if i == self.axis_count:
+                offset *= self.extrude_factor
+            self.base_position[i] = self.last_position[i] - offset
+        if not any_set:
             self.base_position = list(self.last_position)
     
     def cmd_M114(self, gcmd):
         # Get Current Position
         p = self._get_gcode_position()
-        if self.axis_count == 3:
-            gcmd.respond_raw("X:%.3f Y:%.3f Z:%.3f E:%.3f" % tuple(p))
-        elif self.axis_count == 6:
-            gcmd.respond_raw("X:%.3f Y:%.3f Z:%.3f A:%.3f B:%.3f C:%.3f E:%.3f" % tuple(p))
+        gcmd.respond_raw(self.m114_format % tuple(p))
     
     def cmd_M220(self, gcmd):
         # Set speed factor override percentage
@@ -295,7 +356,7 @@ class GCodeMove:
         #       the older value. Dividing by the old factor must then remove its
         #       effect, and multiplying by the new one applies it.
         self.speed = self._get_gcode_speed() * value
-        self.speed_factor = value
+        self._set_speed_factor(value)
     
     def cmd_M221(self, gcmd):
         # Set extrude factor override percentage
@@ -307,8 +368,8 @@ class GCodeMove:
     
     cmd_SET_GCODE_OFFSET_help = "Set a virtual offset to g-code positions"
     def cmd_SET_GCODE_OFFSET(self, gcmd):
-        move_delta = [0.0 for i in range(self.axis_count + 1)]
-        for pos, axis in enumerate(self.axis_names + 'E'):
+        move_delta = [0.0] * (self.axis_count + 1)
+        for pos, axis in self.axis_enum_e:
             offset = gcmd.get_float(axis, None)
             if offset is None:
                 offset = gcmd.get_float(axis + '_ADJUST', None)
@@ -322,44 +383,47 @@ class GCodeMove:
         # Move the toolhead the given offset if requested
         if gcmd.get_int('MOVE', 0):
             speed = gcmd.get_float('MOVE_SPEED', self.speed, above=0.)
-            for pos, delta in enumerate(move_delta):
-                self.last_position[pos] += delta
+            self.last_position = list(map(operator.add, self.last_position,
+                                          move_delta))
             self.move_with_transform(self.last_position, speed)
     
     cmd_SAVE_GCODE_STATE_help = "Save G-Code coordinate state"
     def cmd_SAVE_GCODE_STATE(self, gcmd):
-        state_name = gcmd.get('NAME', 'default')
-        self.saved_states[state_name] = {
-            'absolute_coord': self.absolute_coord,
-            'absolute_extrude': self.absolute_extrude,
-            'base_position': list(self.base_position),
-            'last_position': list(self.last_position),
-            'homing_position': list(self.homing_position),
-            'speed': self.speed, 'speed_factor': self.speed_factor,
-            'extrude_factor': self.extrude_factor,
-        }
+        state_name = sys.intern(gcmd.get('NAME', 'default'))
+        state = self.saved_states.get(state_name)
+        if state is None:
+            state = self.saved_states[state_name] = GCodeState(
+                self.axis_count)
+        state.absolute_coord = self.absolute_coord
+        state.absolute_extrude = self.absolute_extrude
+        state.base_position[:] = self.base_position
+        state.last_position[:] = self.last_position
+        state.homing_position[:] = self.homing_position
+        state.speed = self.speed
+        state.speed_factor = self.speed_factor
+        state.extrude_factor = self.extrude_factor
     
     cmd_RESTORE_GCODE_STATE_help = "Restore a previously saved G-Code state"
     def cmd_RESTORE_GCODE_STATE(self, gcmd):
-        state_name = gcmd.get('NAME', 'default')
+        state_name = sys.intern(gcmd.get('NAME', 'default'))
         state = self.saved_states.get(state_name)
         if state is None:
             raise gcmd.error("Unknown g-code state: %s" % (state_name,))
         # Restore state
-        self.absolute_coord = state['absolute_coord']
-        self.absolute_extrude = state['absolute_extrude']
-        self.base_position = list(state['base_position'])
-        self.homing_position = list(state['homing_position'])
-        self.speed = state['speed']
-        self.speed_factor = state['speed_factor']
-        self.extrude_factor = state['extrude_factor']
+        self.absolute_coord = state.absolute_coord
+        self.absolute_extrude = state.absolute_extrude
+        self.base_position[:] = state.base_position
+        self.homing_position[:] = state.homing_position
+        self.speed = state.speed
+        self._set_speed_factor(state.speed_factor)
+        self.extrude_factor = state.extrude_factor
         # Restore the relative E position
-        e_diff = self.last_position[self.axis_count] - state['last_position'][self.axis_count]
+        e_diff = self.last_position[self.axis_count] - state.last_position[self.axis_count]
         self.base_position[self.axis_count] += e_diff
         # Move the toolhead back if requested
         if gcmd.get_int('MOVE', 0):
             speed = gcmd.get_float('MOVE_SPEED', self.speed, above=0.)
-            self.last_position[:self.axis_count] = state['last_position'][:self.axis_count]
+            self.last_position[:self.axis_count] = state.last_position[:self.axis_count]
             self.move_with_transform(self.last_position, speed)
     
     cmd_GET_POSITION_help = (
@@ -378,23 +442,33 @@ class GCodeMove:
         kin = toolhead.get_kinematics(axes=self.axis_names)
         steppers = kin.get_steppers()
         
-        # NOTE: the horror.
-        mcu_pos = " ".join(["%s:%d" % (s.get_name(), s.get_mcu_position())
-                            for s in steppers])
-        cinfo = [(s.get_name(), s.get_commanded_position()) for s in steppers]
-        stepper_pos = " ".join(["%s:%.6f" % (a, v) for a, v in cinfo])
-        kinfo = zip(self.axis_names, kin.calc_position(dict(cinfo)))
-        
-        kin_pos = " ".join(["%s:%.6f" % (a, v) for a, v in kinfo])
-        toolhead_pos = " ".join(["%s:%.6f" % (a, v) for a, v in zip(
-            self.axis_names + "E", toolhead.get_position())])
+        mcu_parts = []
+        stepper_parts = []
+        cinfo = {}
+        for s in steppers:
+            name = s.get_name()
+            cpos = s.get_commanded_position()
+            cinfo[name] = cpos
+            mcu_parts.append("%s:%d" % (name, s.get_mcu_position()))
+            stepper_parts.append("%s:%.6f" % (name, cpos))
+        mcu_pos = " ".join(mcu_parts)
+        stepper_pos = " ".join(stepper_parts)
+        kin_pos = " ".join(["%s:%.6f" % (a, v) for a, v in zip(
+            self.axis_names, kin.calc_position(cinfo))])
         
-        gcode_pos = " ".join(["%s:%.6f"  % (a, v)
-                              for a, v in zip(self.axis_names + "E", self.last_position)])
-        base_pos = " ".join(["%s:%.6f"  % (a, v)
-                             for a, v in zip(self.axis_names + "E", self.base_position)])
-        homing_pos = " ".join(["%s:%.6f"  % (a, v)
-                               for a, v in zip(self.axis_names, self.homing_position)])
+        toolhead_parts = []
+        gcode_parts = []
+        base_parts = []
+        for a, tp, gp, bp in zip(self.axis_names_e, toolhead.get_position(),
+                                 self.last_position, self.base_position):
+            toolhead_parts.append("%s:%.6f" % (a, tp))
+            gcode_parts.append("%s:%.6f" % (a, gp))
+            base_parts.append("%s:%.6f" % (a, bp))
+        toolhead_pos = " ".join(toolhead_parts)
+        gcode_pos = " ".join(gcode_parts)
+        base_pos = " ".join(base_parts)
+        homing_pos = " ".join(["%s:%.6f" % (a, v) for a, v in zip(
+            self.axis_names, self.homing_position)])
         
         gcmd.respond_info("mcu: %s\n"
                           "stepper: %s\n"
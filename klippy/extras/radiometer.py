@@ -7,17 +7,10 @@
 
 import logging
 import re
-import time
+import struct
 import pexpect
 import serial
 
-from functools import reduce
-
-try:
-    from queue import Queue, Empty
-except ImportError:
-    from Queue import Queue, Empty
-
 
 REPORT_TIME = 2.0
 
@@ -35,6 +28,10 @@ GAIN_RESPOND_LENGTH = 4
 PACKET_HEADER_LENGTH = 2
 PACKET_HEADER_CRC_LENGTH = 3
 
+# Ответ с данными: стартовый байт, длина, сигнал (u16), температура (i16),
+# усиление (u8), контрольная сумма.
+DATA_RESPOND_STRUCT = struct.Struct('<xxHhBx')
+
 K_KOEFF = 1.0
 GAIN = 1
 
@@ -45,7 +42,21 @@ PROMPT = '#'
 
 SERIAL_PORT = '/dev/serial/by-path/pci-0000:00:1d.0-usb-0:1.2:1.0-port0'
 SERIAL_BAUD = 115200
-SERIAL_TIME = 0.5
+
+# Очистка вывода bluetoothctl от ANSI-последовательностей и символов
+# \x01/\x02 (маркеры readline).
+ANSI_ESCAPE_RE = re.compile(r'''
+    \x1B        # ESC
+        (?:     # 7-bit C1 Fe (except CSI)
+        [@-Z\\-_]
+    |           # or [ for CSI, followed by a control sequence
+    \[
+        [0-?]*  # Parameter bytes
+        [ -/]*  # Intermediate bytes
+        [@-~]   # Final byte
+    )
+''', re.VERBOSE)
+CONTROL_CHARS_TABLE = {0x01: None, 0x02: None}
 
 GAIN_CHOICE = {x: x for x in (1, 2, 4, 8)}
 
@@ -55,19 +66,8 @@ SERIAL_BAUD_CHOICE = {x: x for x in (
 )}
 
 
-def get_data_from_queue(queue):
-    data = b''
-    while not queue.empty():
-        try:
-            data = queue.get_nowait()
-        except Empty as em:
-            logging.warning(f'В очереди нет данных ({em.args})')
-    return data
-
-
 def calc_crc(data: bytes):
-    overflow_sum = reduce(lambda a, b: a + b, data).to_bytes(4, ENDIAN)
-    return overflow_sum[:1]  # Именно так, иначе будет возвращен int.
+    return bytes((sum(data) & 0xFF,))  # Именно bytes, а не int.
 
 
 class Radiometer:
@@ -85,11 +85,10 @@ class Radiometer:
 
         self.serial = None
         self.main_timer = None
-        self.read_timer = None
-        self.read_buffer = b''
-        self.read_queue = Queue()
-        self.write_timer = None
-        self.write_queue = Queue()
+        self.serial_fd_handle = None
+        self.read_buffer = bytearray()
+        # Последний принятый пакет, ожидающий обработки.
+        self.last_response = None
 
         self.response_length = None
         self.start = True
@@ -105,12 +104,7 @@ class Radiometer:
         self.serial_baud = config.getchoice(
             'serial_baud', choices=SERIAL_BAUD_CHOICE, default=SERIAL_BAUD
         )
-        self.serial_baud = config.getint(
-            'serial_baud', default=self.serial_baud
-        )
-
         self.gain = config.getchoice('gain', choices=GAIN_CHOICE, default=GAIN)
-        self.gain = config.getint('gain', self.gain)
 
         if self.printer.get_start_args().get('debugoutput') is not None:
             return
@@ -131,18 +125,11 @@ class Radiometer:
         return REPORT_TIME
 
     def _clear_log(self, text):
-        ansi_escape = re.compile(r'''
-            \x1B        # ESC
-                (?:     # 7-bit C1 Fe (except CSI)
-                [@-Z\\-_]
-            |           # or [ for CSI, followed by a control sequence
-            \[
-                [0-?]*  # Parameter bytes
-                [ -/]*  # Intermediate bytes
-                [@-~]   # Final byte
-            )
-        ''', re.VERBOSE)
-        return ansi_escape.sub('', text).replace('\x01', '').replace('\x02', '')
+        return ANSI_ESCAPE_RE.sub('', text).translate(CONTROL_CHARS_TABLE)
+
+    def _pause(self, delay):
+        # Ожидание без блокировки остальных задач reactor.
+        self.reactor.pause(self.reactor.monotonic() + delay)
 
     def _radiometer_connect(self):
         try:
@@ -162,7 +149,7 @@ class Radiometer:
             p.sendline('scan on')
             p.expect(PROMPT)
             logging.warning(self._clear_log(p.before))
-            time.sleep(10)
+            self._pause(10.)
 
             p.sendline(f'remove {self.rd_mac_address}')
             p.expect(PROMPT)
@@ -176,7 +163,7 @@ class Radiometer:
 
                     p.sendline(self.rd_pin_code)
                     logging.warning(self._clear_log(p.before))
-                    time.sleep(3)
+                    self._pause(3.)
 
                     # child = pexpect.spawn('bt-device -l', timeout=None)
                     # for line in child: 
@@ -211,11 +198,7 @@ class Radiometer:
             )
 
     def _open_serial(self):
-        with self.write_queue.mutex:
-            self.write_queue.queue.clear()
-
-        with self.read_queue.mutex:
-            self.read_queue.queue.clear()
+        self.last_response = None
 
         self._radiometer_connect()
 
@@ -227,11 +210,9 @@ class Radiometer:
             self._sample_radiometer, self.reactor.NOW
         )
 
-        self.read_timer = self.reactor.register_timer(
-            self._read_serial, self.reactor.NOW
-        )
-        self.write_timer = self.reactor.register_timer(
-            self._write_serial, self.reactor.NOW
+        # Данные читаются по готовности дескриптора порта, а не по таймеру.
+        self.serial_fd_handle = self.reactor.register_fd(
+            self.serial.fileno(), self._read_serial
         )
 
     def _handle_connect(self):
@@ -243,14 +224,15 @@ class Radiometer:
         return 1
     
     def _set_gain(self):
-        data = CHANGE_GAIN_COMMAND + self.gain.to_bytes(1, ENDIAN)
-
-        command = START_BYTE
-        command += len(data).to_bytes(1, ENDIAN)
-        command += data
+        # Стартовый байт, длина поля данных (команда и усиление),
+        # команда, усиление, контрольная сумма.
+        command = bytearray(START_BYTE)
+        command.append(len(CHANGE_GAIN_COMMAND) + 1)
+        command += CHANGE_GAIN_COMMAND
+        command.append(self.gain)
         command += calc_crc(command)
 
-        return command
+        return bytes(command)
 
     def _decode_data(self, data):
         data_len = len(data)
@@ -260,13 +242,9 @@ class Radiometer:
         if crc == calc_crc(data_body):
 
             if data_len == DATA_RESPOND_LENGTH:
-                temp = int.from_bytes(data[4:6], byteorder=ENDIAN, signed=True)
+                sig, temp, self.gain = DATA_RESPOND_STRUCT.unpack_from(data)
                 self.temp = float(self.k_koeff * temp)
-
-                sig = int.from_bytes(data[2:4], byteorder=ENDIAN, signed=False)
                 self.sig = float(self._f_temp() * sig)
-                
-                self.gain = data[6]
 
             elif data_len == GAIN_RESPOND_LENGTH:
                 respond = data[2:3]
@@ -296,12 +274,14 @@ class Radiometer:
     def _sample_radiometer(self, eventtime: int):
      
         if self.start:
-            self.write_queue.put(self._set_gain())
+            command = self._set_gain()
             self.start = False
         else:
-            self.write_queue.put(READ_DATA_COMMAND)
+            command = READ_DATA_COMMAND
+        logging.warning(f'Send {command}')
+        self.serial.write(command)
        
-        data = get_data_from_queue(self.read_queue)
+        data, self.last_response = self.last_response, None
 
         if data:
             self._decode_data(data)
@@ -315,48 +295,42 @@ class Radiometer:
 
         return measured_time + REPORT_TIME
 
-    def _write_serial(self, eventtime):
-        data = get_data_from_queue(self.write_queue)
-        if data:
-            logging.warning(f'Send {data}')
-            self.serial.write(data)
-        return eventtime + SERIAL_TIME
-
     def _read_serial(self, eventtime):
+        read_buffer = self.read_buffer
         while True:
-            self.read_buffer += self.serial.read()
-
-            if len(self.read_buffer):
-                # Считали стартовый байт и байт длины поля данных.
-                if len(self.read_buffer) == PACKET_HEADER_LENGTH:
-                    if self.read_buffer[:1] == START_BYTE:
-                        # Добавили стартовый байт, байт длины и
-                        # контрольную сумму.
-                        data_length = self.read_buffer[1]
-                        self.response_length = (
-                            data_length + PACKET_HEADER_CRC_LENGTH
-                        )
-                    else:
-                        logging.error(
-                            'Ошибка в ответе радиометра, отсутствует стартовый '
-                            'байт'
-                        )
-                        self.response_length = None
-                        self.read_buffer = b''
-                        break
-
-                if len(self.read_buffer) == self.response_length:
-                    logging.warning(f'Recv {self.read_buffer}')
-                    self.read_queue.put(self.read_buffer)
-                    self.response_length = None
-                    self.read_buffer = b''
-                    break
+            # Сначала читаем заголовок (стартовый байт и байт длины поля
+            # данных), затем остаток пакета целиком.
+            if self.response_length is None:
+                need = PACKET_HEADER_LENGTH - len(read_buffer)
             else:
-                self.response_length = None
-                self.read_buffer = b''
+                need = self.response_length - len(read_buffer)
+
+            chunk = self.serial.read(need)
+            read_buffer.extend(chunk)
+            if len(chunk) < need:
+                # Остаток пакета еще не пришел, дочитаем, когда порт
+                # снова будет готов к чтению.
                 break
-        
-        return eventtime + SERIAL_TIME
+
+            if self.response_length is None:
+                if read_buffer[0] == START_BYTE[0]:
+                    # Добавили стартовый байт, байт длины и
+                    # контрольную сумму.
+                    self.response_length = (
+                        read_buffer[1] + PACKET_HEADER_CRC_LENGTH
+                    )
+                else:
+                    logging.error(
+                        'Ошибка в ответе радиометра, отсутствует стартовый '
+                        'байт'
+                    )
+                    read_buffer.clear()
+            else:
+                packet = bytes(read_buffer)
+                logging.warning(f'Recv {packet}')
+                self.last_response = packet
+                self.response_length = None
+                read_buffer.clear()
 
     def get_status(self, eventtime):
         return {
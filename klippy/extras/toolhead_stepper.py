@@ -3,7 +3,7 @@
 # Copyright (C) 2016-2021  Kevin O'Connor <kevin@koconnor.net>
 #
 # This file may be distributed under the terms of the GNU GPLv3 license.
-import math, logging, importlib
+import math, logging, importlib, operator
 import mcu, chelper, kinematics.extruder
 import time
 
@@ -14,6 +14,20 @@ from toolhead import MoveQueue, LOOKAHEAD_FLUSH_TIME, MIN_KIN_TIME, MOVE_BATCH_T
 from extras.gcode_move import GCodeMove
 from extras.homing import PrinterHoming
 
+# XYZ equivalents of the toolhead's axis IDs (see ExtraToolHead.axes_to_xyz).
+XYZ_IDS = (0, 1, 2, 0, 1, 2)
+
+# Junction factors of Move.calc_junction for a move continuing in the
+# same direction, where junction_cos_theta is clamped to -0.999999.
+STRAIGHT_SIN_THETA_D2 = math.sqrt(0.5*(1.0+0.999999))
+STRAIGHT_R_JD = STRAIGHT_SIN_THETA_D2 / (1. - STRAIGHT_SIN_THETA_D2)
+STRAIGHT_HALF_TAN_THETA_D2 = (.5 * STRAIGHT_SIN_THETA_D2
+                              / math.sqrt(1.0 - 0.5*(1.0+0.999999)))
+
+# Factor relating the square corner velocity to the junction deviation
+# (see ExtraToolHead._calc_junction_deviation).
+SQUARE_CORNER_JD_FACTOR = math.sqrt(2.) - 1.
+
 # Common suffixes: _d is distance (in mm), _v is velocity (in
 #   mm/second), _v2 is velocity squared (mm^2/s^2), _t is time (in
 #   seconds), _r is ratio (scalar between 0.0 and 1.0)
@@ -33,13 +47,25 @@ Within the host code, print times are generally stored in variables named print_
 
 # Class to track each move request
 class Move:
+    __slots__ = ('toolhead', 'start_pos', 'end_pos', 'accel',
+                 'junction_deviation', 'timing_callbacks', 'is_kinematic_move',
+                 'axis_count', 'axes_d', 'move_d', 'axes_r', 'axes_r_kin',
+                 'has_extrude',
+                 'min_move_t',
+                 'max_start_v2', 'max_cruise_v2', 'delta_v2',
+                 'max_smoothed_v2', 'smooth_delta_v2',
+                 'start_v', 'cruise_v', 'end_v',
+                 'accel_t', 'cruise_t', 'decel_t', 'total_t')
     def __init__(self, toolhead, start_pos, end_pos, speed):
-        logging.info(f"\n\nExtraMove: setup with start_pos={start_pos} and end_pos={end_pos}\n\n")
-        
         self.toolhead = toolhead
+        self.reset(start_pos, end_pos, speed)
+    
+    def reset(self, start_pos, end_pos, speed):
+        """Setup the move, also used to recycle processed moves (see ExtraToolHead.move)."""
+        toolhead = self.toolhead
         self.start_pos = tuple(start_pos)
         self.end_pos = tuple(end_pos)
-        self.accel = toolhead.max_accel
+        self.accel = accel = toolhead.max_accel
         self.junction_deviation = toolhead.junction_deviation
         self.timing_callbacks = []
         # NOTE: "toolhead.max_velocity" contains the value from the config file.
@@ -51,42 +77,46 @@ class Move:
         velocity = min(speed, toolhead.max_velocity)
         self.is_kinematic_move = True
         
-        # NOTE: amount of non-extruder axes: XYZ=3, XYZABC=6.
-        self.axis_names = toolhead.axis_names
+        # NOTE: amount of non-extruder axes, padded to full axis sets: XYZ=3, XYZA=6.
         # TODO: only this bit was changed, find a way to not need to redefine "Move" here, and import from toolhead.py instead
-        self.min_axis_sets = toolhead.min_axis_sets
-        self.axis_count = self.min_axis_sets*3 # len(self.axis_names)
+        self.axis_count = axis_count = toolhead.move_axis_count
 
         # NOTE: Compute the components of the displacement vector.
         #       The last component is now the extruder.
-        self.axes_d = axes_d = [end_pos[i] - start_pos[i] for i in range(self.axis_count + 1)]
+        self.axes_d = axes_d = list(map(operator.sub, end_pos, start_pos))
+        # NOTE: whether the extruder moves, checked by "ExtraToolHead.move"
+        #       and "ExtraToolHead._process_moves".
+        self.has_extrude = bool(axes_d[axis_count])
         
         # NOTE: compute the euclidean magnitude of the XYZ(ABC) displacement vector.
-        self.move_d = move_d = math.sqrt(sum([d*d for d in axes_d[:self.axis_count]]))
-        
-        logging.info(f"\n\nExtraMove: setup with axes_d={axes_d} and move_d={move_d}.\n\n")
+        #       Not using "math.hypot" with more than two arguments, which
+        #       requires Python 3.8. The sum is unrolled for the common XYZ case.
+        if axis_count == 3:
+            dx, dy, dz = axes_d[0], axes_d[1], axes_d[2]
+            move_d = math.sqrt(dx*dx + dy*dy + dz*dz)
+        else:
+            move_d = math.sqrt(sum([d*d for d in axes_d[:axis_count]]))
+        self.move_d = move_d
         
         # NOTE: If the move in XYZ is very small, then parse it as an extrude-only move.
         if move_d < .000000001:
             # Extrude only move
             
-            # NOTE: the main axes wont move, thus end=stop.
-            self.end_pos = tuple([start_pos[i] for i in range(self.axis_count)])
-            # NOTE: the extruder will move.
-            self.end_pos = self.end_pos + (end_pos[self.axis_count],)
+            # NOTE: the main axes wont move, thus end=stop,
+            #       but the extruder will move.
+            self.end_pos = self.start_pos[:axis_count] + (end_pos[axis_count],)
             
             # NOTE: set axis displacement to zero.
-            for i in range(self.axis_count):
-                axes_d[i] = 0.
+            axes_d[:axis_count] = [0.] * axis_count
             
             # NOTE: set move distance to the extruder's displacement.
-            self.move_d = move_d = abs(axes_d[self.axis_count])
+            self.move_d = move_d = abs(axes_d[axis_count])
             
             # NOTE: set more stuff (?)
             inv_move_d = 0.
             if move_d:
                 inv_move_d = 1. / move_d
-            self.accel = 99999999.9
+            self.accel = accel = 99999999.9
             velocity = speed
             self.is_kinematic_move = False
         else:
@@ -94,7 +124,10 @@ class Move:
         
         # NOTE: Compute a ratio between each component of the displacement
         #       vector and the total magnitude.
-        self.axes_r = [d * inv_move_d for d in axes_d]
+        self.axes_r = axes_r = [d * inv_move_d for d in axes_d]
+        # NOTE: Ratios of the kinematic axes only, used for the junction angle
+        #       (the extruder's ratio is handled by "extruder.calc_junction").
+        self.axes_r_kin = tuple(axes_r[:axis_count])
         
         # NOTE: Compute the mimimum time that the move will take (at speed == max speed).
         #       The time will be greater if the axes must accelerate during the move.
@@ -105,9 +138,9 @@ class Move:
         # can change in this move.
         self.max_start_v2 = 0.
         self.max_cruise_v2 = velocity**2
-        self.delta_v2 = 2.0 * move_d * self.accel
+        self.delta_v2 = 2.0 * move_d * accel
         self.max_smoothed_v2 = 0.
-        self.smooth_delta_v2 = 2.0 * move_d * toolhead.max_accel_to_decel
+        self.smooth_delta_v2 = move_d * toolhead.two_max_accel_to_decel
     
     def limit_speed(self, speed, accel):
         speed2 = speed**2
@@ -130,38 +163,47 @@ class Move:
         if not self.is_kinematic_move or not prev_move.is_kinematic_move:
             return
         
-        logging.info("\n\nExtraMove.calc_junction: function triggered.\n\n")
+        # Find max velocity using "approximated centripetal velocity"
+        axes_r_kin = self.axes_r_kin
+        prev_axes_r_kin = prev_move.axes_r_kin
+        if axes_r_kin == prev_axes_r_kin:
+            # NOTE: Same direction as the previous move, the junction angle
+            #       is clamped to the straight limit (see STRAIGHT_R_JD).
+            R_jd = STRAIGHT_R_JD
+            half_tan_theta_d2 = STRAIGHT_HALF_TAN_THETA_D2
+        else:
+            junction_cos_theta = -sum(map(operator.mul, axes_r_kin,
+                                          prev_axes_r_kin))
+            if junction_cos_theta > 0.999999:
+                # NOTE: The move reverses the previous one, no junction speed.
+                return
+            sqrt = math.sqrt
+            junction_cos_theta = max(junction_cos_theta, -0.999999)
+            # NOTE: sin(theta/2)^2 and cos(theta/2)^2 add up to one.
+            sin2_theta_d2 = 0.5*(1.0-junction_cos_theta)
+            sin_theta_d2 = sqrt(sin2_theta_d2)
+            R_jd = sin_theta_d2 / (1. - sin_theta_d2)
+            # Approximated circle must contact moves no further away than mid-move
+            half_tan_theta_d2 = .5 * sin_theta_d2 / sqrt(1.0 - sin2_theta_d2)
         
         # Allow extruder to calculate its maximum junction
         # NOTE: Uses the "instant_corner_v" config parameter.
+        #       Not needed when the move reverses the previous one.
         extruder_v2 = self.toolhead.extruder.calc_junction(prev_move, self)
         
-        # Find max velocity using "approximated centripetal velocity"
-        axes_r = self.axes_r
-        prev_axes_r = prev_move.axes_r
-        junction_cos_theta = -sum([ axes_r[0] * prev_axes_r[0] for i in range(self.axis_count) ])
-        if junction_cos_theta > 0.999999:
-            return
-        junction_cos_theta = max(junction_cos_theta, -0.999999)
-        sin_theta_d2 = math.sqrt(0.5*(1.0-junction_cos_theta))
-        R_jd = sin_theta_d2 / (1. - sin_theta_d2)
-        
-        # Approximated circle must contact moves no further away than mid-move
-        tan_theta_d2 = sin_theta_d2 / math.sqrt(0.5*(1.0+junction_cos_theta))
-        move_centripetal_v2 = .5 * self.move_d * tan_theta_d2 * self.accel
-        prev_move_centripetal_v2 = (.5 * prev_move.move_d * tan_theta_d2
-                                    * prev_move.accel)
+        accel = self.accel
+        prev_accel = prev_move.accel
+        move_centripetal_v2 = half_tan_theta_d2 * self.move_d * accel
+        prev_move_centripetal_v2 = half_tan_theta_d2 * prev_move.move_d * prev_accel
         # Apply limits
-        self.max_start_v2 = min(
-            R_jd * self.junction_deviation * self.accel,
-            R_jd * prev_move.junction_deviation * prev_move.accel,
+        self.max_start_v2 = max_start_v2 = min(
+            R_jd * self.junction_deviation * accel,
+            R_jd * prev_move.junction_deviation * prev_accel,
             move_centripetal_v2, prev_move_centripetal_v2,
             extruder_v2, self.max_cruise_v2, prev_move.max_cruise_v2,
             prev_move.max_start_v2 + prev_move.delta_v2)
-        self.max_smoothed_v2 = min(self.max_start_v2, 
+        self.max_smoothed_v2 = min(max_start_v2, 
                                    prev_move.max_smoothed_v2 + prev_move.smooth_delta_v2)
-        
-        logging.info("\n\nExtraMove.calc_junction: function end.\n\n")
     
     def set_junction(self, start_v2, cruise_v2, end_v2):
         """Move.set_junction() implements the "trapezoid generator" on a move.
@@ -176,24 +218,25 @@ class Move:
             end_v2 (_type_): _description_
         """
         
-        logging.info("\n\nExtraMove.set_junction: function triggered.\n\n")
-        
         # Determine accel, cruise, and decel portions of the move distance
         half_inv_accel = .5 / self.accel
         accel_d = (cruise_v2 - start_v2) * half_inv_accel
         decel_d = (cruise_v2 - end_v2) * half_inv_accel
         cruise_d = self.move_d - accel_d - decel_d
         # Determine move velocities
-        self.start_v = start_v = math.sqrt(start_v2)
-        self.cruise_v = cruise_v = math.sqrt(cruise_v2)
-        self.end_v = end_v = math.sqrt(end_v2)
+        # NOTE: moves without an accel or decel portion reuse the cruise velocity.
+        sqrt = math.sqrt
+        self.cruise_v = cruise_v = sqrt(cruise_v2)
+        self.start_v = start_v = (cruise_v if start_v2 == cruise_v2
+                                  else sqrt(start_v2))
+        self.end_v = end_v = (cruise_v if end_v2 == cruise_v2
+                              else sqrt(end_v2))
         # Determine time spent in each portion of move (time is the
         # distance divided by average velocity)
-        self.accel_t = accel_d / ((start_v + cruise_v) * 0.5)
-        self.cruise_t = cruise_d / cruise_v
-        self.decel_t = decel_d / ((end_v + cruise_v) * 0.5)
-        
-        logging.info("\n\nExtraMove.set_junction: function end.\n\n")
+        self.accel_t = accel_t = accel_d / ((start_v + cruise_v) * 0.5)
+        self.cruise_t = cruise_t = cruise_d / cruise_v
+        self.decel_t = decel_t = decel_d / ((end_v + cruise_v) * 0.5)
+        self.total_t = accel_t + cruise_t + decel_t
 
 
 
@@ -250,6 +293,9 @@ class ExtraToolHead:
         # Prefix for event names
         # TODO: go through this. It may need to be changed to an instance-specific name.
         self.event_prefix = self.config_name + "_"  # In the main toolhead this is blank (i.e. just "").
+        # Names of the events sent by "set_position" and "manual_move".
+        self.set_position_event = self.event_prefix + "toolhead:set_position"
+        self.manual_move_event = self.event_prefix + "toolhead:manual_move"
 
         # NOTE: amount of non-extruder axes: XYZ=3, XYZABC=6.
         self.axis_letters = "XYZABCUVW"
@@ -272,36 +318,49 @@ class ExtraToolHead:
         # that's what fits on a cartesian trapq).
         self.axes = [i for i, a in enumerate(self.axis_letters) if a in self.axis_names]
         # self.axes = list(range(self.axis_count))
-        self.min_axis_sets = math.ceil(self.axis_count / 3)
+        self.min_axis_sets = (self.axis_count + 2) // 3
+        # Length of the position vectors without the extruder, padded to full axis sets.
+        self.move_axis_count = self.min_axis_sets * 3
 
         # Make a list of axis sets, for 5 axes this would be: "[[0, 1, 2], [0, 1]]"
         # for 6 axes, "[[0, 1, 2], [0, 1, 2]]", for 7 axes "[[0, 1, 2], [0, 1, 3], [0]"],
         # and so on.
         self.axis_sets = [[] for i in range(self.min_axis_sets)]
-        _ = [self.axis_sets[i // 3].append(a) for i, a in enumerate(self.axes)]         # [0,1,2], [3, 4], ...
+        for i, a in enumerate(self.axes):
+            self.axis_sets[i // 3].append(a)                                            # [0,1,2], [3, 4], ...
         # _ = [self.axis_sets[i // 3].append(i % 3) for i, a in enumerate(self.axes)]     # [0,1,2], [0, 1], ...
         
         # TODO: support more kinematics.
         self.supported_kinematics = ["cartesian_abc"]
         
-        msg = f"\n\nExtraToolHead: starting setup with axes: "
-        msg += f"self.axis_count={self.axis_count} self.axis_names={self.axis_names} "
-        msg += f"self.axes={self.axes} self.min_axis_sets={self.min_axis_sets} axis_sets={self.axis_sets}\n\n"
-        logging.info(msg)
+        logging.info("ExtraToolHead: starting setup with axis_names=%s axes=%s"
+                     " min_axis_sets=%d axis_sets=%s", self.axis_names,
+                     self.axes, self.min_axis_sets, self.axis_sets)
         
         self.printer = config.get_printer()
         self.reactor = self.printer.get_reactor()
         self.all_mcus = [m for n, m in self.printer.lookup_objects(module='mcu')]
         self.mcu = self.all_mcus[0]
+        self.estimated_print_time = self.mcu.estimated_print_time
         self.can_pause = True
         if self.mcu.is_fileoutput():
             # NOTE: This triggers if 'debugoutput' is not None in the config,
             #       see "mcu.py".
             self.can_pause = False
         self.move_queue = MoveQueue(self)
-        self.commanded_pos = [0.0 for i in range(self.min_axis_sets*3 + 1)]  # TODO: check if this is a good idea :)
+        self.move_pool = []
+        self.commanded_pos = [0.0] * (self.move_axis_count + 1)  # TODO: check if this is a good idea :)
+        # NOTE: "Coord" of "commanded_pos" for "get_status", built when
+        #       requested and reset to None whenever "commanded_pos" changes.
+        self.commanded_coord = None
+        # NOTE: Key and result of the last "get_status" call. Reset
+        #       to "(None, None)" whenever something other than the
+        #       position or print time changes the status.
+        self.last_status = (None, None)
         self.printer.register_event_handler("klippy:shutdown",
                                             self._handle_shutdown)
+        self.printer.register_event_handler("stepper_enable:motor_off",
+                                            self._handle_motor_off)
         # Stuff to register this toolhead in the main toolhead
         self.main_toolhead = None
         self.printer.register_event_handler("klippy:ready", self._handle_ready)
@@ -346,6 +405,7 @@ class ExtraToolHead:
         ffi_main, ffi_lib = chelper.get_ffi()
         self.trapq_append = ffi_lib.trapq_append
         self.trapq_finalize_moves = ffi_lib.trapq_finalize_moves
+        self.trapq_set_position = ffi_lib.trapq_set_position
         self.step_generators = []
         
         # NOTE: load the gcode objects (?)
@@ -368,7 +428,6 @@ class ExtraToolHead:
         gcode.register_command(self.gcode_prefix + 'M204'[1:], self.cmd_M204)
 
         # TODO: move this back to GcodeMove
-        self.last_position = self.commanded_pos.copy()
         self.speed = 25.
         self.speed_factor = 1. / 60.
 
@@ -378,7 +437,8 @@ class ExtraToolHead:
         self.main_toolhead = self.printer.lookup_object("toolhead")
         # Example: {"abc": toolheadobject}
         self.main_toolhead.extra_toolheads[self.config_name] = self
-        logging.info(f"\n\nExtraToolHead: registered extra toolhead with name={self.config_name}\n\n")
+        logging.info("ExtraToolHead: registered extra toolhead with name=%s",
+                     self.config_name)
     # def cmd_XG0(self, gcmd):
     #     # Move
     #     params = gcmd.get_command_parameters()
@@ -444,7 +504,7 @@ class ExtraToolHead:
             #   [0, 1, 2], [3, 4], [3, 4, 5], etc.
             
             # Example "axis_set_letters": "XYZ", "AB", ...
-            axis_set_letters = " ".join([self.axis_letters[i] for i in axis_set])
+            axis_set_letters = "".join([self.axis_letters[i] for i in axis_set])
             
             # Example "axis_set_idxs": [0, 1, 2], [0, 1], ...
             axis_set_idxs = [i % 3 for i in axis_set]
@@ -461,7 +521,22 @@ class ExtraToolHead:
             # Save the kinematics to the dict, with axis letters as key.
             self.kinematics[axis_set_letters] = kin
 
-            self.kinematics_names = list(self.kinematics)
+        self.kinematics_names = list(self.kinematics)
+        # NOTE: kinematic reported by "get_status" when none is requested.
+        self.default_kin_name = self.kinematics_names[0]
+        
+        # NOTE: the following are fixed once the axes are loaded, and used by
+        #       "_update_move_time", "_process_moves", and "move".
+        kins = self.kinematics.values()
+        self.kin_trapqs = tuple(kin.trapq for kin in kins)
+        # NOTE: trapq and toolhead position indexes of each kinematic.
+        self.kin_trapq_axes = tuple((kin.trapq, kin.axis[0], kin.axis[1], kin.axis[2])
+                                    for kin in kins)
+        self.kin_check_moves = tuple(kin.check_move for kin in kins)
+        # NOTE: getters of the toolhead position elements of each kinematic,
+        #       used by "set_position".
+        self.kin_pos_getters = tuple((kin, operator.itemgetter(*kin.axis))
+                                     for kin in kins)
     
     # Load kinematics object
     def setup_kinematics(self, config, axes_ids=(0,1,2), axis_set_letters="XYZ",
@@ -527,22 +602,29 @@ class ExtraToolHead:
         # NOTE: It also calls "trapq_finalize_moves" on the extruder and toolhead.
         # NOTE: a possible "use case" in the code is to:
         #           "Generate steps for moves"
-        
-        logging.info(f"\n\nExtraToolHead: _update_move_time triggered with next_print_time={next_print_time}\n\n")
 
         kin_flush_delay = self.kin_flush_delay
+        kin_trapqs = self.kin_trapqs
+        trapq_finalize_moves = self.trapq_finalize_moves
+        step_generators = self.step_generators
+        move_flush_time = self.move_flush_time
+        all_mcus = self.all_mcus
         # TODO: what is "fft"? It used to be named "last_kin_flush_time".
         fft = self.force_flush_time
+        # NOTE: "print_time" is only changed by this loop, and is kept
+        #       in a local (stored back on every iteration).
+        print_time = self.print_time
         # TODO: I don't yet understand what the loop is meant to accomplish.
         while 1:
             # NOTE: Start by incrementing "print_time" by "batch_time", unless
             #       "next_print_time" is smaller.
-            self.print_time = min(self.print_time + batch_time, next_print_time)
+            self.print_time = print_time = min(print_time + batch_time,
+                                               next_print_time)
             
             # NOTE: Generate steps before the "sg_flush_time" time. That time is defined as
             #       "self.force_flush_time", unless it is after "print_time-kin_flush_delay".
-            sg_flush_time = max(fft, self.print_time - kin_flush_delay)
-            for sg in self.step_generators:
+            sg_flush_time = max(fft, print_time - kin_flush_delay)
+            for sg in step_generators:
                 # NOTE: "self.step_generators" has been populated with "generate_steps" functions,
                 #       one per stepper, by each kinematic class (including the extruder class).
                 #       Those functions in turn end up calling "ffi_lib.itersolve_generate_steps"
@@ -557,11 +639,9 @@ class ExtraToolHead:
             # NOTE: Update move times on the toolhead's trapqs, meaning:
             #       "Expire any moves older than `free_time` from
             #       the trapezoid velocity queue" (see trapq.c).
-            for axes in list(self.kinematics):
-                # Iterate over ["XYZ", "ABC"].
-                kin = self.kinematics[axes]
-                logging.info(f"\n\nExtraToolHead._update_move_time calling trapq_finalize_moves on axes={axes} with free_time={free_time}\n\n")
-                self.trapq_finalize_moves(kin.trapq, free_time)
+            for trapq in kin_trapqs:
+                # Iterate over the "XYZ", "ABC", ... trapqs.
+                trapq_finalize_moves(trapq, free_time)
             
             # NOTE: "free_time" is smaller than "sg_flush_time" by "kin_flush_delay",
             #       which is defined from "SDS_CHECK_TIME".
@@ -578,13 +658,13 @@ class ExtraToolHead:
             #       "trapq_finalize_moves" in PrinterExtruder.
             self.extruder.update_move_time(free_time)
 
-            mcu_flush_time = max(fft, sg_flush_time - self.move_flush_time)
-            for m in self.all_mcus:
+            mcu_flush_time = max(fft, sg_flush_time - move_flush_time)
+            for m in all_mcus:
                 # NOTE: The following may find and transmit any scheduled steps 
                 #       prior to the given 'mcu_flush_time' (see stepcompress.c
                 #       and "flush_moves" in mcu.py).
                 m.flush_moves(mcu_flush_time)
-            if self.print_time >= next_print_time:
+            if print_time >= next_print_time:
                 break
     
     def _calc_print_time(self):
@@ -606,7 +686,7 @@ class ExtraToolHead:
         #       from the ClockSync class. That object is updated in 
         #       the background by "_handle_clock" which:
         #       "is invoked from background thread" for "MCU clock querying".
-        est_print_time = self.mcu.estimated_print_time(curtime)
+        est_print_time = self.estimated_print_time(curtime)
 
         # NOTE: Guessing that the following adds potential delays to 
         #       the MCU time, estimating a "minimum print time".
@@ -664,9 +744,6 @@ class ExtraToolHead:
         #       the "flush" method in a "MoveQueue" class instance.
         #       The "moves" argument receives a "queue" of moves "ready to be flushed".
         
-        # NOTE: logging for tracing activity
-        logging.info("\n\n" + f"{self.name}._process_moves: function triggered.\n\n")
-        
         # Resync print_time if necessary
         if self.special_queuing_state:
             if self.special_queuing_state != "Drip":
@@ -679,7 +756,6 @@ class ExtraToolHead:
             # NOTE Update "self.print_time".
             self._calc_print_time()
             # NOTE: Also sends a "toolhead:sync_print_time" event.
-            logging.info("\n\n" + f"{self.name}._process_moves: self.print_time={str(self.print_time)}\n\n")
         
         # Queue moves into trapezoid motion queue (trapq)
         # NOTE: the "trapq" is possibly something like a CFFI object.
@@ -687,27 +763,30 @@ class ExtraToolHead:
         #       object the one responsible for sending commands to
         #       the MCUs.
         next_move_time = self.print_time
+        kin_trapq_axes = self.kin_trapq_axes
+        trapq_append = self.trapq_append
         for move in moves:
-            logging.info("\n\n" + f"{self.name}._process_moves: next_move_time={str(next_move_time)}")
-            
-            for axes in list(self.kinematics):
-                # Iterate over["XYZ", "A"]
-                logging.info("\n\n" + f"{self.name}._process_moves: appending move to {axes} trapq.\n\n")
-                kin = self.kinematics[axes]
-                # NOTE: The moves are first placed on a "trapezoid motion queue" with trapq_append.
-                if move.is_kinematic_move:
-                    self.trapq_append(
-                        kin.trapq, next_move_time,
-                        move.accel_t, move.cruise_t, move.decel_t,
+            # NOTE: Extrude-only moves are not added to the kinematic trapqs.
+            if move.is_kinematic_move:
+                # NOTE: the move's values are the same for every trapq.
+                start_pos, axes_r = move.start_pos, move.axes_r
+                accel_t, cruise_t, decel_t = move.accel_t, move.cruise_t, move.decel_t
+                start_v, cruise_v, accel = move.start_v, move.cruise_v, move.accel
+                for trapq, a0, a1, a2 in kin_trapq_axes:
+                    # Iterate over the "XYZ", "ABC", ... trapqs.
+                    # NOTE: The moves are first placed on a "trapezoid motion queue" with trapq_append.
+                    trapq_append(
+                        trapq, next_move_time,
+                        accel_t, cruise_t, decel_t,
                         # NOTE: "kin.axis" is used to select the position value that corresponds
                         #       to the current kinematic axis (e.g. kin.axis is [0,1,2] for the XYZ axis,
                         #       or [3,4,5] for the ABC axis).
-                        move.start_pos[kin.axis[0]], move.start_pos[kin.axis[1]], move.start_pos[kin.axis[2]],
-                        move.axes_r[kin.axis[0]], move.axes_r[kin.axis[1]], move.axes_r[kin.axis[2]],
-                        move.start_v, move.cruise_v, move.accel)
+                        start_pos[a0], start_pos[a1], start_pos[a2],
+                        axes_r[a0], axes_r[a1], axes_r[a2],
+                        start_v, cruise_v, accel)
             
             # NOTE: Repeat for the extruder's trapq.
-            if move.axes_d[self.axis_count]:
+            if move.has_extrude:
                 # NOTE: The extruder stepper move is likely synced to the main
                 #       XYZ movement here, by sharing the "next_move_time"
                 #       parameter in the call.
@@ -715,20 +794,17 @@ class ExtraToolHead:
             
             # NOTE: The start MCU time for the next move in 
             #       the move queue is calculated here.
-            next_move_time = (next_move_time + move.accel_t
-                              + move.cruise_t + move.decel_t)
+            next_move_time += move.total_t
             
             # NOTE: Execute any "callbacks" registered 
             #       to be run at the end of this move.
-            for cb in move.timing_callbacks:
-                cb(next_move_time)
+            if move.timing_callbacks:
+                for cb in move.timing_callbacks:
+                    cb(next_move_time)
         
         # Generate steps for moves
         if self.special_queuing_state:
             # NOTE: this block is executed when "special_queuing_state" is not None.
-            # NOTE: loging "next_move_time" for tracing.
-            logging.info("\n\nExtraToolHead _process_moves: calling _update_drip_move_time with " +
-                         f"next_move_time={str(next_move_time)}\n\n")
             # NOTE: this function loops "while self.print_time < next_print_time".
             #       It "pauses before sending more steps" using "drip_completion.wait",
             #       and calls "_update_move_time". 
@@ -739,15 +815,23 @@ class ExtraToolHead:
         #       Here, it is passed to "_update_move_time" (which updates
         #       "self.print_time" and calls "trapq_finalize_moves") and
         #       to overwrite "self.last_kin_move_time".
-        logging.info(f"\n\nExtraToolHead _process_moves: _update_move_time with next_move_time={next_move_time}\n\n")
         self._update_move_time(next_move_time)
-        self.last_kin_move_time = max(self.last_kin_move_time, next_move_time)
-        logging.info(f"\n\nExtraToolHead _process_moves: last_kin_move_time set to next_move_time={self.last_kin_move_time}\n\n")
+        # NOTE: "note_kinematic_activity" (e.g. from manual steppers) may
+        #       have already set a later time, so this can not be a plain
+        #       assignment.
+        if next_move_time > self.last_kin_move_time:
+            self.last_kin_move_time = next_move_time
+        
+        # NOTE: The moves are no longer needed once their steps have been
+        #       generated, release them to be reused by "move". This must
+        #       be the last step, as nothing here may pause the reactor
+        #       before the caller removes them from the move queue (if it
+        #       did not already, see "MoveQueue.flush").
+        self.move_pool.extend(moves)
         
     def flush_step_generation(self):
         # Transition from "Flushed"/"Priming"/main state to "Flushed" state
         # NOTE: a "use case" for drip moves is to: 'Exit "Drip" state'
-        logging.info(f"\n\nExtraToolHead.flush_step_generation: triggered.\n\n")
 
         # NOTE: this is the "flush" method from a "MoveQueue" object.
         #       It calls "_process_moves" on the moves in the queue that
@@ -772,11 +856,12 @@ class ExtraToolHead:
         self.idle_flush_print_time = 0.
         
         # Determine actual last "itersolve" flush time
-        lastf = self.print_time - self.kin_flush_delay
+        print_time = self.print_time
+        lastf = print_time - self.kin_flush_delay
         
         # Calculate flush time that includes kinematic scan windows
         flush_time = max(lastf, self.last_kin_move_time + self.kin_flush_delay)
-        if flush_time > self.print_time:
+        if flush_time > print_time:
             # Flush in small time chunks
             # NOTE: the following updates "self.print_time" and
             #       calls "trapq_finalize_moves".
@@ -815,17 +900,20 @@ class ExtraToolHead:
         if self.special_queuing_state:
             if self.idle_flush_print_time:
                 # Was in "Flushed" state and got there from idle input
-                est_print_time = self.mcu.estimated_print_time(eventtime)
+                est_print_time = self.estimated_print_time(eventtime)
                 if est_print_time < self.idle_flush_print_time:
                     self.print_stall += 1
+                    # NOTE: the stall count is part of the status.
+                    self.last_status = (None, None)
                 self.idle_flush_print_time = 0.
             # Transition from "Flushed"/"Priming" state to "Priming" state
             self.special_queuing_state = "Priming"
             self.need_check_stall = -1.
             self.reactor.update_timer(self.flush_timer, eventtime + 0.100)
         # Check if there are lots of queued moves and stall if so
+        # NOTE: the estimate only needs refreshing after the reactor paused.
+        est_print_time = self.estimated_print_time(eventtime)
         while 1:
-            est_print_time = self.mcu.estimated_print_time(eventtime)
             buffer_time = self.print_time - est_print_time
             stall_time = buffer_time - self.buffer_time_high
             if stall_time <= 0.:
@@ -834,6 +922,7 @@ class ExtraToolHead:
                 self.need_check_stall = self.reactor.NEVER
                 return
             eventtime = self.reactor.pause(eventtime + min(1., stall_time))
+            est_print_time = self.estimated_print_time(eventtime)
         if not self.special_queuing_state:
             # In main state - defer stall checking until needed
             self.need_check_stall = (est_print_time + self.buffer_time_high
@@ -843,7 +932,7 @@ class ExtraToolHead:
         """Callback function for the 'self.flush_timer' reactor timer"""
         try:
             print_time = self.print_time
-            buffer_time = print_time - self.mcu.estimated_print_time(eventtime)
+            buffer_time = print_time - self.estimated_print_time(eventtime)
             if buffer_time > self.buffer_time_low:
                 # Running normally - reschedule check
                 return eventtime + buffer_time - self.buffer_time_low
@@ -865,65 +954,40 @@ class ExtraToolHead:
         
         Has no effect on XYZ IDs
         """
-        logging.info(f"\n\nExtraToolHead.axes_to_xyz: input={axes}\n\n")
-        
-        xyz_ids = [0, 1, 2, 0, 1, 2]
-        
-        try:
-            if isinstance(axes, list) or isinstance(axes, tuple):
-                result = [xyz_ids[i] for i in axes]
-            else:
-                result = xyz_ids[axes]
-        except:
-            raise Exception(f"\n\nExtraToolHead.axes_to_xyz: error with input={axes}\n\n")
-        
-        logging.info(f"\n\nExtraToolHead.axes_to_xyz: output={result}\n\n")
-        
-        return result
-    
-    def get_elements(self, toolhead_pos, axes):
-        return [toolhead_pos[axis] for axis in axes]
+        if isinstance(axes, (list, tuple)):
+            return [XYZ_IDS[i] for i in axes]
+        return XYZ_IDS[axes]
     
     def set_position(self, newpos, homing_axes=()):
-        logging.info("\n\n" + f"{self.name}.set_position: setting newpos={newpos} and homing_axes={homing_axes}\n\n")
         self.flush_step_generation()
             
-        # NOTE: Set the position of the axes "trapq".
-        for axes in list(self.kinematics):
-            # Iterate over["XYZ", "ABC"]
-            logging.info("\n\n" + f"{self.name}.set_position: setting {axes} trapq position.\n\n")
-            kin = self.kinematics[axes]
+        # NOTE: Set the position of the axes "trapq" and "kinematics".
+        for kin, get_kin_pos in self.kin_pos_getters:
+            # Iterate over the "XYZ", "ABC", ... kinematics.
             # Filter the axis IDs according to the current kinematic
-            new_kin_pos = self.get_elements(newpos, kin.axis)
-            logging.info("\n\n" + f"{self.name}.set_position: using newpos={new_kin_pos}\n\n")
+            new_kin_pos = list(get_kin_pos(newpos))
             self.set_kin_trap_position(kin.trapq, new_kin_pos)
+            # Filter the homing axis IDs, and convert them to the "0,1,2" range.
+            kin_homing_axes = self.axes_to_xyz([axis for axis in homing_axes if axis in kin.axis])
+            self.set_kinematics_position(kin=kin, newpos=new_kin_pos, homing_axes=tuple(kin_homing_axes))
         
         # NOTE: Also set the position of the extruder's "trapq".
         #       Runs "trapq_set_position" and "rail.set_position".
-        logging.info("\n\n" + f"{self.name}.set_position: setting E trapq pos.\n\n")
         self.set_position_e(newpos_e=newpos[self.axis_count], homing_axes=homing_axes)
         
-        # NOTE: Set the position of the axes "kinematics".
-        for axes in list(self.kinematics):
-            # Iterate over["XYZ", "ABC"]
-            logging.info("\n\n" + f"{self.name}.set_position: setting {axes} kinematic position.\n\n")
-            kin = self.kinematics[axes]
-            # Filter the axis IDs according to the current kinematic, and convert them to the "0,1,2" range.
-            kin_homing_axes = self.axes_to_xyz([axis for axis in homing_axes if axis in kin.axis])
-            new_kin_pos = self.get_elements(newpos, kin.axis)
-            logging.info("\n\n" + f"{self.name}.set_position: using newpos={new_kin_pos} and kin_homing_axes={kin_homing_axes}\n\n")
-            self.set_kinematics_position(kin=kin, newpos=new_kin_pos, homing_axes=tuple(kin_homing_axes))
-            
         # NOTE: "set_position_e" was inserted above and not after 
         #       updating "commanded_pos" under the suspicion that 
         #       an unmodified "commanded_pos" might be important.
         self.commanded_pos[:] = newpos
+        self.commanded_coord = None
+        # NOTE: the kinematics may have new limits (i.e. "homed_axes").
+        self.last_status = (None, None)
         
         # NOTE: This event is mainly recived by "gcode_move.reset_last_position",
         #       which updates its "self.last_position" with (presumably) the
         #       "self.commanded_pos" above.
         # TODO: Reenable this once (or if) I adapt "gcode_move" to handle it.
-        self.printer.send_event(self.event_prefix + "toolhead:set_position")  # "toolhead:set_position"
+        self.printer.send_event(self.set_position_event)  # "toolhead:set_position"
         
     def set_kin_trap_position(self, trapq, newpos):
         """Abstraction of trapq_set_position for different sets of kinematics.
@@ -935,12 +999,8 @@ class ExtraToolHead:
         
         if trapq is not None:
             # NOTE: Set the position of the toolhead's "trapq".
-            logging.info("\n\n" + f"{self.name}.set_kin_trap_position: setting trapq pos to newpos={newpos}\n\n")
-            ffi_main, ffi_lib = chelper.get_ffi()
-            ffi_lib.trapq_set_position(trapq, self.print_time,
-                                       newpos[0], newpos[1], newpos[2])
-        else:
-            logging.info("\n\n" + f"{self.name}.set_kin_trap_position: trapq was None, skipped setting to newpos={newpos}\n\n")
+            self.trapq_set_position(trapq, self.print_time,
+                                    newpos[0], newpos[1], newpos[2])
     
     def set_kinematics_position(self, kin, newpos, homing_axes):
         """Abstraction of kin.set_position for different sets of kinematics.
@@ -957,15 +1017,10 @@ class ExtraToolHead:
         #       calls "itersolve_set_position" from "itersolve.c".
         # NOTE: Passing only the first three elements (XYZ) to this set_position.
         if kin is not None:
-            logging.info("\n\n" + f"{self.name}.set_kinematics_position: setting kinematic position with newpos={newpos} and homing_axes={homing_axes}\n\n")
             kin.set_position(newpos, homing_axes=tuple(homing_axes))
-        else:
-            logging.info("\n\n" + f"{self.name}.set_kinematics_position: kin was None, skipped setting to newpos={newpos} and homing_axes={homing_axes}\n\n")
 
     def set_position_e(self, newpos_e, homing_axes=()):
         """Extruder version of set_position."""
-        logging.info("\n\n" + f"{self.name}.set_position_e: setting E to newpos={newpos_e}.\n\n")
-        
         # Get the active extruder
         extruder = self.get_extruder()  # PrinterExtruder
         
@@ -986,11 +1041,17 @@ class ExtraToolHead:
             newpos (_type_): _description_
             speed (_type_): _description_
         """
-        logging.info(f"\n\n"+ f"{self.name}.move: moving to newpos={newpos}.\n\n")
-        move = Move(toolhead=self, 
-                    start_pos=self.commanded_pos,
-                    end_pos=newpos, 
-                    speed=speed)
+        # NOTE: reuse a Move released by "_process_moves" if available.
+        if self.move_pool:
+            move = self.move_pool.pop()
+            move.reset(start_pos=self.commanded_pos,
+                       end_pos=newpos,
+                       speed=speed)
+        else:
+            move = Move(toolhead=self, 
+                        start_pos=self.commanded_pos,
+                        end_pos=newpos, 
+                        speed=speed)
         # NOTE: So far, the clock time for when this move
         #       will be sent are not known.
         # NOTE: Stepper move commands are not sent with
@@ -998,7 +1059,7 @@ class ExtraToolHead:
 
         # NOTE: Move checks.
         if not move.move_d:
-            logging.info(f"\n\n"+ f"{self.name}.move: early return, nothing to move. move.move_d={move.move_d}\n\n")
+            self.move_pool.append(move)
             return
         
         # NOTE: Kinematic move checks for XYZ and ABC axes.
@@ -1006,24 +1067,22 @@ class ExtraToolHead:
         #       (and thus is_kinematic_move is False, see the "Move" class above).
         if move.is_kinematic_move and self.check_moves:
             # for axes in ["XYZ"]:
-            for axes in list(self.kinematics):    
-                # Iterate over["XYZ", "ABC"]
-                logging.info("\n\n" + f"{self.name}.move: check_move on {axes} move.\n\n")
-                kin = self.kinematics[axes]
-                kin.check_move(move)
+            for check_move in self.kin_check_moves:
+                # Iterate over the "XYZ", "ABC", ... kinematics.
+                check_move(move)
             # self.kin.check_move(move)
             # TODO: implement move checks for ABC axes here too.
             # if self.abc_trapq is not None:
             #     self.kin_abc.check_move(move)
             
         # NOTE: Kinematic move checks for E axis.
-        if move.axes_d[self.axis_count]:
-            logging.info("\n\n" + f"{self.name}.move: check_move on E move to {move.axes_d[self.axis_count]}.\n\n")
+        if move.has_extrude:
             self.extruder.check_move(move, e_axis=self.axis_count)
         
         # NOTE: Update "commanded_pos" with the "end_pos"
         #       of the current move command.
         self.commanded_pos[:] = move.end_pos
+        self.commanded_coord = None
         
         # NOTE: Add the Move object to the MoveQueue.
         self.move_queue.add_move(move)
@@ -1035,13 +1094,13 @@ class ExtraToolHead:
         # NOTE: the "manual_move" command interprets "None" values
         #       as the latest (commanded) coordinates.
         
-        # NOTE: get the current (last) position.
-        curpos = list(self.commanded_pos)
+        # NOTE: get the current (last) position, overwritten with
+        #       the move's target postion.
+        commanded_pos = self.commanded_pos
+        curpos = [p if c is None else c for c, p in zip(coord, commanded_pos)]
         
-        # NOTE: overwrite with the move's target postion.
-        for i in range(len(coord)):
-            if coord[i] is not None:
-                curpos[i] = coord[i]
+        # NOTE: keep the current position of axes missing from "coord".
+        curpos.extend(commanded_pos[len(curpos):])
                 
         # NOTE: send move.
         self.move(curpos, speed)
@@ -1050,7 +1109,7 @@ class ExtraToolHead:
         #       (at gcode_move.py) which updates "self.last_position"
         #       in the GCodeMove class.
         # TODO: Reenable this once (or if) I adapt "gcode_move" to handle it.
-        self.printer.send_event(self.event_prefix + "toolhead:manual_move")  # "toolhead:manual_move"
+        self.printer.send_event(self.manual_move_event)  # "toolhead:manual_move"
     
     def dwell(self, delay):
         # NOTE: get_last_move_time runs "_flush_lookahead" which then
@@ -1080,7 +1139,7 @@ class ExtraToolHead:
         #       or while the "print_time" is greater than the result of
         #       "mcu.estimated_print_time(eventtime)" (which converts "clock time"
         #       to "print time", see "clocksync.py").
-        while (not self.special_queuing_state) or (self.print_time >= self.mcu.estimated_print_time(eventtime)):
+        while (not self.special_queuing_state) or (self.print_time >= self.estimated_print_time(eventtime)):
             
             # NOTE: break the loop if the toolhead "cannot be paused".
             if not self.can_pause:
@@ -1089,11 +1148,18 @@ class ExtraToolHead:
             # NOTE: "pause" the reactor for a bit before looping again.
             #       This command does a bunch of undocumented stuff with
             #       greenlet objects, and may use "time.sleep" in some case.
-            eventtime = self.reactor.pause(eventtime + 0.100)
+            # NOTE: Sleep until the queued moves are estimated to be done
+            #       (print time advances with the host's clock), instead
+            #       of waking up every 100ms until then.
+            est_print_time = self.estimated_print_time(eventtime)
+            eventtime = self.reactor.pause(
+                eventtime + max(0.100, self.print_time - est_print_time))
     
     def set_extruder(self, extruder, extrude_pos):
         self.extruder = extruder
         self.commanded_pos[self.axis_count] = extrude_pos
+        self.commanded_coord = None
+        self.last_status = (None, None)
     
     def get_extruder(self):
         return self.extruder
@@ -1103,31 +1169,47 @@ class ExtraToolHead:
         # NOTE: called by "_process_moves" when in a "special_queuing_state"
         #       (i.e. when its value is not "" or None).
         flush_delay = DRIP_TIME + self.move_flush_time + self.kin_flush_delay
-        while self.print_time < next_print_time:
+        drip_completion = self.drip_completion
+        # NOTE: The completion can only change while the reactor runs other
+        #       tasks, which here only happens during "drip_completion.wait".
+        #       It is then only tested on entry and after each wait.
+        check_completion = True
+        reactor, can_pause = self.reactor, self.can_pause
+        estimated_print_time = self.estimated_print_time
+        # NOTE: "print_time" is re-read after it may have changed, that is
+        #       after a wait or a call to "_update_move_time".
+        print_time = self.print_time
+        while print_time < next_print_time:
             # NOTE: "drip_completion.test" is a method from "ReactorCompletion",
             #       but is beyond my understanding and deathwishes for spelunking.
             # NOTE: The "drip_completion" object was created by the "multi_complete"
             #       function at "homing.py", from a list of "wait" objects (returned
             #       by the "MCU_endstop.home_start" method, called during homing).
             # TODO: ask what it is for!
-            if self.drip_completion.test():
+            if check_completion and drip_completion.test():
                 # NOTE: this "exception" does nothing, it "passes",
                 #       but it is caught at the "drip_move" method,
                 #       which runs "move_queue.reset" and "trapq_finalize_moves"
                 #       in response. This must be an "alternate" way to break
                 #       the while loop. A bit hacky though.
                 raise DripModeEndSignal()
-            curtime = self.reactor.monotonic()
-            est_print_time = self.mcu.estimated_print_time(curtime)
-            wait_time = self.print_time - est_print_time - flush_delay
-            if wait_time > 0. and self.can_pause:
+            curtime = reactor.monotonic()
+            est_print_time = estimated_print_time(curtime)
+            wait_time = print_time - est_print_time - flush_delay
+            if wait_time > 0. and can_pause:
                 # Pause before sending more steps
-                self.drip_completion.wait(curtime + wait_time)
+                drip_completion.wait(curtime + wait_time)
+                check_completion = True
+                print_time = self.print_time
                 continue
-            npt = min(self.print_time + DRIP_SEGMENT_TIME, next_print_time)
+            check_completion = False
+            npt = print_time + DRIP_SEGMENT_TIME
+            if npt > next_print_time:
+                npt = next_print_time
             # NOTE: this updates "self.print_time" and calls "trapq_finalize_moves",
             #       possibly to "Generate steps for moves".
             self._update_move_time(next_print_time=npt)
+            print_time = self.print_time
             # NOTE: because how "print_time" is updated, the while loop will end
             #       before "self.print_time >= next_print_time" by "MOVE_BATCH_TIME".
     
@@ -1150,7 +1232,7 @@ class ExtraToolHead:
         try:
             # NOTE: uses "add_move", to add a move to the "move_queue".
             # NOTE: logging for tracing activity
-            logging.info("\n\ndrip_move: sending move to the queue.\n\n")
+            logging.debug("drip_move: sending move to the queue.")
             self.move(newpos, speed)
         except self.printer.command_error as e:
             self.flush_step_generation()
@@ -1162,10 +1244,10 @@ class ExtraToolHead:
             #       not None "special_queuing_state", the "_process_moves" 
             #       call will use "_update_drip_move_time".
             # NOTE: logging for tracing activity
-            logging.info("\n\ndrip_move: flushing move queue / transmitting move.\n\n")
+            logging.debug("drip_move: flushing move queue / transmitting move.")
             self.move_queue.flush()
         except DripModeEndSignal as e:
-            logging.info("\n\ndrip_move: resetting move queue / DripModeEndSignal caught.\n\n")
+            logging.debug("drip_move: resetting move queue / DripModeEndSignal caught.")
             
             # NOTE: deletes al moves in the queue
             self.move_queue.reset()
@@ -1175,10 +1257,10 @@ class ExtraToolHead:
             #       - Flush all moves from trapq (in the case of print_time=NEVER_TIME)
             #       I am guessing here that "older" means "with a smaller timestamp",
             #       or "previous". Otherwise it would not make sense.
-            for axes in list(self.kinematics):
+            for axes, kin in self.kinematics.items():
                 # Iterate over ["XYZ", "ABC"].
-                kin = self.kinematics[axes]
-                logging.info(f"\n\nExtraToolHead.drip_move calling trapq_finalize_moves on axes={axes} free_time=self.reactor.NEVER ({self.reactor.NEVER})\n\n")
+                logging.debug("drip_move: calling trapq_finalize_moves on axes=%s"
+                              " free_time=reactor.NEVER", axes)
                 self.trapq_finalize_moves(kin.trapq, self.reactor.NEVER)
             
             # # NOTE: This calls a function in "trapq.c", described as:
@@ -1204,7 +1286,7 @@ class ExtraToolHead:
         
         # Exit "Drip" state
         # NOTE: logging for tracing activity
-        logging.info("\n\ndrip_move: calling flush_step_generation / exit drip state.\n\n")
+        logging.debug("drip_move: calling flush_step_generation / exit drip state.")
         # NOTE: the "flush_step_generation" method, which calls:
         #       - "flush", which should do nothing (dine just above, and the queue is empty).
         #       - "reactor.update_timer"
@@ -1218,42 +1300,62 @@ class ExtraToolHead:
     
     # Misc commands
     def stats(self, eventtime):
+        print_time = self.print_time
         for m in self.all_mcus:
-            m.check_active(self.print_time, eventtime)
-        buffer_time = self.print_time - self.mcu.estimated_print_time(eventtime)
-        is_active = buffer_time > -60. or not self.special_queuing_state
-        if self.special_queuing_state == "Drip":
+            m.check_active(print_time, eventtime)
+        buffer_time = print_time - self.estimated_print_time(eventtime)
+        special_queuing_state = self.special_queuing_state
+        is_active = buffer_time > -60. or not special_queuing_state
+        # NOTE: the real buffer time is needed above even in "Drip" state.
+        if buffer_time < 0. or special_queuing_state == "Drip":
             buffer_time = 0.
         return is_active, "print_time=%.3f buffer_time=%.3f print_stall=%d" % (
-            self.print_time, max(buffer_time, 0.), self.print_stall)
+            print_time, buffer_time, self.print_stall)
     def check_busy(self, eventtime):
-        est_print_time = self.mcu.estimated_print_time(eventtime)
+        est_print_time = self.estimated_print_time(eventtime)
         lookahead_empty = not self.move_queue.queue
         return self.print_time, est_print_time, lookahead_empty
     def get_status(self, eventtime, kin_name=None):
 
         if kin_name is None:
-            kin_name = self.kinematics_names[0]
+            kin_name = self.default_kin_name
             # NOTE: this is called too often, it spams the log.
             # logging.info(f"\n\nExtraToolHead.get_status: called without kinematic parameter, defaulting to kin_name={kin_name}\n\n")
 
         print_time = self.print_time
-        estimated_print_time = self.mcu.estimated_print_time(eventtime)
-        res = dict(self.kinematics[kin_name].get_status(eventtime))
-        res.update({ 'print_time': print_time,
-                     'stalls': self.print_stall,
-                     'estimated_print_time': estimated_print_time,
-                     'extruder': self.extruder.get_name(),
-                     'position': self.Coord(*self.commanded_pos),
-                     'max_velocity': self.max_velocity,
-                     'max_accel': self.max_accel,
-                     'max_accel_to_decel': self.requested_accel_to_decel,
-                     'square_corner_velocity': self.square_corner_velocity})
+        commanded_coord = self.commanded_coord
+        if commanded_coord is None:
+            self.commanded_coord = commanded_coord = self.Coord(*self.commanded_pos)
+        # NOTE: Status queries from several clients in the same reactor
+        #       tick get the same status, unless the toolhead moved since.
+        status_key = (kin_name, eventtime, print_time)
+        last_status_key, last_status = self.last_status
+        if (status_key == last_status_key
+            and last_status['position'] is commanded_coord):
+            return last_status
+        estimated_print_time = self.estimated_print_time(eventtime)
+        # NOTE: built as a single dict, on top of the kinematic's status.
+        res = {**self.kinematics[kin_name].get_status(eventtime),
+               'print_time': print_time,
+               'stalls': self.print_stall,
+               'estimated_print_time': estimated_print_time,
+               'extruder': self.extruder.get_name(),
+               'position': commanded_coord,
+               'max_velocity': self.max_velocity,
+               'max_accel': self.max_accel,
+               'max_accel_to_decel': self.requested_accel_to_decel,
+               'square_corner_velocity': self.square_corner_velocity}
+        self.last_status = (status_key, res)
         return res
     
     def _handle_shutdown(self):
         self.can_pause = False
         self.move_queue.reset()
+        self.last_status = (None, None)
+    
+    def _handle_motor_off(self, print_time):
+        # NOTE: the kinematics reset their limits (i.e. "homed_axes").
+        self.last_status = (None, None)
     
     def get_kinematics(self, axes="XYZ"):
         return self.kinematics[axes]
@@ -1266,20 +1368,28 @@ class ExtraToolHead:
     
     def note_step_generation_scan_time(self, delay, old_delay=0.):
         self.flush_step_generation()
-        cur_delay = self.kin_flush_delay
+        # NOTE: "kin_flush_delay" is the largest of "kin_flush_times"
+        #       and SDS_CHECK_TIME, updated here instead of re-scanning
+        #       the list, unless its largest delay was removed.
+        kin_flush_times = self.kin_flush_times
+        new_delay = self.kin_flush_delay
         if old_delay:
-            self.kin_flush_times.pop(self.kin_flush_times.index(old_delay))
+            kin_flush_times.remove(old_delay)
+            if old_delay >= new_delay:
+                new_delay = max(kin_flush_times + [SDS_CHECK_TIME])
         if delay:
-            self.kin_flush_times.append(delay)
-        new_delay = max(self.kin_flush_times + [SDS_CHECK_TIME])
+            kin_flush_times.append(delay)
+            if delay > new_delay:
+                new_delay = delay
         self.kin_flush_delay = new_delay
     
     def register_lookahead_callback(self, callback):
-        last_move = self.move_queue.get_last()
-        if last_move is None:
+        # NOTE: reads the lookahead queue directly (see "MoveQueue.get_last").
+        queue = self.move_queue.queue
+        if not queue:
             callback(self.get_last_move_time())
             return
-        last_move.timing_callbacks.append(callback)
+        queue[-1].timing_callbacks.append(callback)
     
     def note_kinematic_activity(self, kin_time):
         self.last_kin_move_time = max(self.last_kin_move_time, kin_time)
@@ -1289,9 +1399,13 @@ class ExtraToolHead:
     
     def _calc_junction_deviation(self):
         scv2 = self.square_corner_velocity**2
-        self.junction_deviation = scv2 * (math.sqrt(2.) - 1.) / self.max_accel
+        self.junction_deviation = scv2 * SQUARE_CORNER_JD_FACTOR / self.max_accel
         self.max_accel_to_decel = min(self.requested_accel_to_decel,
                                       self.max_accel)
+        # NOTE: cached for Move, which needs it for every queued move.
+        self.two_max_accel_to_decel = 2.0 * self.max_accel_to_decel
+        # NOTE: velocity limits are part of the status.
+        self.last_status = (None, None)
         
     # GCODE command handlers
     def cmd_G4(self, gcmd):
@@ -1367,6 +1481,17 @@ class ExtraGCodeMove(GCodeMove):
       - The "checks" still have the XYZ logic.
       - Homing is not implemented for ABC.
     """
+    # NOTE: G-Code commands registered with the toolhead's prefix, with the
+    #       names of their handler and help attributes. "Conventional" GCODEs
+    #       get the prefix instead of their first letter (e.g. "G1" as "X1"),
+    #       the others are prefixed as in "X_SET_GCODE_OFFSET".
+    gcode_handlers = tuple((cmd, 'cmd_' + cmd, 'cmd_' + cmd + '_help')
+                           for cmd in ['G1', 'G20', 'G21', 'M82', 'M83',
+                                       'G90', 'G91', 'G92', 'M220', 'M221'])
+    extended_gcode_handlers = tuple(
+        (cmd, 'cmd_' + cmd, 'cmd_' + cmd + '_help')
+        for cmd in ['SET_GCODE_OFFSET', 'SAVE_GCODE_STATE',
+                    'RESTORE_GCODE_STATE'])
     def __init__(self, config, toolhead):
         
         # Get the "toolhead name" from the toolhead
@@ -1377,7 +1502,6 @@ class ExtraGCodeMove(GCodeMove):
         self.event_prefix = self.toolhead.event_prefix
         
         # NOTE: amount of non-extruder axes: XYZ=3, XYZABC=6.
-        # TODO: cmd_M114 only supports 3 or 6 for now.
         # TODO: find a way to get the axis value from the config, this does not work.
         # self.axis_names = config.get('axis', 'XYZABC')  # "XYZ" / "XYZABC"
         # self.axis_names = kwargs.get("axis", "XYZ")  # "XYZ" / "XYZABC"
@@ -1386,6 +1510,7 @@ class ExtraGCodeMove(GCodeMove):
         # self.axis_count = len(self.axis_names)
         self.axis_names = self.toolhead.axis_names
         self.axis_count = len(self.axis_names)
+        self._setup_axis_lookups()
 
         logging.info(f"\n\nGCodeMove.{self.toolhead_name}: starting setup with axes={self.axis_names} for toolhead_id='{self.toolhead_id}'\n\n")
         
@@ -1406,24 +1531,18 @@ class ExtraGCodeMove(GCodeMove):
         
         # Register "conventional" g-code commands.
         gcode = printer.lookup_object('gcode')
-        handlers = ['G1', 'G20', 'G21', 'M82', 'M83', 
-                    'G90', 'G91', 'G92', 'M220', 'M221']
-        # NOTE: this iterates over the commands above and finds the functions
-        #       and description strings by their names (as they appear in "handlers").
-        for cmd in handlers:
-            func = getattr(self, 'cmd_' + cmd)
-            desc = getattr(self, 'cmd_' + cmd + '_help', None)
+        # NOTE: this iterates over the commands in "gcode_handlers" and finds the
+        #       functions and description strings by their attribute names.
+        for cmd, func_name, desc_name in self.gcode_handlers:
             # NOTE: replace the first letter of "conventional" GCODEs with the specified prefix.
             #       For example, replace "G1" with "X1".
-            gcode.register_command(self.gcode_prefix + cmd[1:], func, when_not_ready=False, desc=desc)
+            gcode.register_command(self.gcode_prefix + cmd[1:], getattr(self, func_name),
+                                   when_not_ready=False, desc=getattr(self, desc_name, None))
         
         # Repeat for non-traditional GCODE commands.
-        handlers = ['SET_GCODE_OFFSET', 'SAVE_GCODE_STATE', 'RESTORE_GCODE_STATE']
-        for cmd in handlers:
-            func = getattr(self, 'cmd_' + cmd)
-            desc = getattr(self, 'cmd_' + cmd + '_help', None)
-            # NOTE: replace the first letter of "conventional" GCODEs with the specified prefix.
-            gcode.register_command(f"{self.gcode_prefix}_{cmd}", func, when_not_ready=False, desc=desc)
+        for cmd, func_name, desc_name in self.extended_gcode_handlers:
+            gcode.register_command(f"{self.gcode_prefix}_{cmd}", getattr(self, func_name),
+                                   when_not_ready=False, desc=getattr(self, desc_name, None))
         
         gcode.register_command(self.gcode_prefix + 'G0'[1:], self.cmd_G1, f"G0 for {self.toolhead.name}")
         gcode.register_command(self.gcode_prefix + 'M114'[1:], self.cmd_M114, True)
@@ -1434,15 +1553,16 @@ class ExtraGCodeMove(GCodeMove):
         
         # G-Code coordinate manipulation
         self.absolute_coord = self.absolute_extrude = True
-        self.base_position = [0.0 for i in range(self.axis_count + 1)]
-        self.last_position = [0.0 for i in range(self.axis_count + 1)]
-        self.homing_position = [0.0 for i in range(self.axis_count + 1)]
+        self.base_position = [0.0] * (self.axis_count + 1)
+        self.last_position = [0.0] * (self.axis_count + 1)
+        self.homing_position = [0.0] * (self.axis_count + 1)
         self.speed = 25.
         # TODO: This 1/60 by default, because "feedrates" 
         #       provided by the "F" GCODE are in "mm/min",
         #       which contrasts with the usual "mm/sec" unit
         #       used throughout Klipper.
         self.speed_factor = 1. / 60.
+        self.inv_speed_factor = 60.
         self.extrude_factor = 1.
         
         # G-Code state
@@ -1451,7 +1571,8 @@ class ExtraGCodeMove(GCodeMove):
         # NOTE: Default function for "position_with_transform", 
         #       overriden later on by "_handle_ready" (which sets
         #       toolhead.get_position) or "set_move_transform".
-        self.position_with_transform = (lambda: [0.0 for i in range(self.axis_count + 1)])
+        zero_position = [0.0] * (self.axis_count + 1)
+        self.position_with_transform = (lambda: list(zero_position))
 
 class ExtraPrinterHoming(PrinterHoming):
     def __init__(self, config, toolhead):
@@ -1481,10 +1602,15 @@ class ToolheadSpinner():
         
         # NOTE: save the "reactor" object, I need it for timers/spinning.
         self.reactor = self.printer.get_reactor()
+        # NOTE: reactor constant and methods used by the spin command and timer.
+        self.NEVER = self.reactor.NEVER
+        self.update_timer = self.reactor.update_timer
+        self.monotonic = self.reactor.monotonic
         
         # NOTE: Need this to register the spin move callback appropriately.
         self.printer.register_event_handler("klippy:ready", self.handle_ready)
         self.spin_timer = None
+        self.estimated_print_time = None  # NOTE: Set on printer handle_ready.
         
         # Timer delay parameters
         # # TODO: make the spin command delay configurable.
@@ -1508,9 +1634,10 @@ class ToolheadSpinner():
         if self.toolhead is None:
             self.toolhead = self.printer.lookup_object('toolhead')
             logging.info(f"\n\nmanual_stepper.handle_ready: registering self.spin_timer.\n\n")
+        self.estimated_print_time = self.toolhead.mcu.estimated_print_time
         
         # waketime = self.time_at_print_time()
-        waketime = self.reactor.NEVER
+        waketime = self.NEVER
         self.spin_timer = self.reactor.register_timer(
             # Callback function.
             self.do_spin_move,
@@ -1519,9 +1646,9 @@ class ToolheadSpinner():
 
     def time_at_print_time(self, print_time=None):
         # Current system time
-        eventtime = self.reactor.monotonic()
+        eventtime = self.monotonic()
         # Current (estimated) MCU print_time
-        est_print_time = self.toolhead.mcu.estimated_print_time(eventtime)
+        est_print_time = self.estimated_print_time(eventtime)
         if not print_time:
             # Actual MCU print_time (after the last move)
             print_time = self.toolhead.get_last_move_time()
@@ -1542,37 +1669,41 @@ class ToolheadSpinner():
         self.spin_params = (movedist, abs(speed), accel, sync)
 
         if not speed:
-            self.reactor.update_timer(self.spin_timer, self.reactor.NEVER)
-        elif self.reactor.NEVER == self.spin_timer.waketime:
+            self.update_timer(self.spin_timer, self.NEVER)
+        elif self.NEVER == self.spin_timer.waketime:
             # Process other moves in the queue
             self.toolhead.flush_step_generation()
             # Trigger the timer to add moves to the queue
             system_print_time = self.time_at_print_time()
-            self.reactor.update_timer(self.spin_timer, system_print_time)
-            logging.info(f"\n\ncmd_SPIN_MANUAL_STEPPER: timer dead. Triggering do_spin_move at waketime={system_print_time}.\n\n")
+            self.update_timer(self.spin_timer, system_print_time)
+            logging.debug("cmd_SPIN_MANUAL_STEPPER: timer dead. Triggering"
+                          " do_spin_move at waketime=%.3f.", system_print_time)
         else:
-            logging.info(f"\n\ncmd_SPIN_MANUAL_STEPPER: timer alive, doing nothing.\n\n")
+            logging.debug("cmd_SPIN_MANUAL_STEPPER: timer alive, doing nothing.")
 
 
     # Continuous rotation (move repeat) timer callback function.
     def do_spin_move(self, eventtime):
+        toolhead = self.toolhead
         # Get the parameters for the current move
-        move = self.spin_params[0]
-        speed = self.spin_params[1]
+        spin_params = self.spin_params
+        move_dist, speed, accel, sync = spin_params
 
         # Actual MCU print_time (after the last move)
-        print_time = self.toolhead.print_time
+        print_time = toolhead.print_time
         
         # Get the print_time (MCU time) associated to
         # the timer's "present" (event) time (in system time).
-        est_print_time = self.toolhead.mcu.estimated_print_time(eventtime)
+        est_print_time = self.estimated_print_time(eventtime)
 
         # Verbooooseeee
-        logging.info(f"\n\ndo_spin_move: called at eventtime={eventtime} est_print_time={est_print_time} with toolhead.print_time={print_time} self.spin_params={self.spin_params}\n\n")
+        logging.debug("do_spin_move: called at eventtime=%.3f est_print_time=%.3f"
+                      " with toolhead.print_time=%.3f spin_params=%s",
+                      eventtime, est_print_time, print_time, spin_params)
         
         # Set a default waketime for this function.
         # The default is to not run the timer again automatically.
-        waketime = self.reactor.NEVER
+        waketime = self.NEVER
         
         # If the speed is null, just sleep.
         if not speed:
@@ -1592,13 +1723,13 @@ class ToolheadSpinner():
         #     curpos[0] += 20.0  # move
         #     self.toolhead.move(curpos, speed)
         #     waketime = eventtime + (20.0/speed)*0.1
-        curpos = self.toolhead.get_position()
+        curpos = toolhead.get_position()
         curpos[0] += speed*2.0 # 20.0  # move
-        self.toolhead.move(curpos, speed)
+        toolhead.move(curpos, speed)
         waketime = eventtime + 1.0
 
         # Update the timer's next firing time.
-        logging.info(f"\n\ndo_spin_move: function ended with waketime={waketime}\n\n")
+        logging.debug("do_spin_move: function ended with waketime=%.3f", waketime)
         return waketime
 
 
@@ -8,6 +8,7 @@ import stepper
 
 class CartKinematics:
     def __init__(self, toolhead, config, trapq=None):
+        self.toolhead = toolhead
         
         # Axis names
         self.axis = [0, 1, 2]
@@ -26,12 +27,17 @@ class CartKinematics:
         # Setup axis rails
         self.dual_carriage_axis = None
         self.dual_carriage_rails = []
+        # NOTE: list of steppers, built by "get_steppers" when needed,
+        #       and reset to None when the rails change.
+        self.steppers = None
         # NOTE: a "PrinterRail" is setup by LookupMultiRail, per each 
         #       of the three axis, including their corresponding endstops.
         # NOTE: The "self.rails" list contains "PrinterRail" objects, which
         #       can have one or more stepper (PrinterStepper/MCU_stepper) objects.
         self.rails = [stepper.LookupMultiRail(config.getsection('stepper_' + n))
                       for n in 'xyz']
+        # NOTE: names of the active rails, used by "calc_position".
+        self.rail_names = [rail.get_name() for rail in self.rails]
         for rail, axis in zip(self.rails, 'xyz'):
             rail.setup_itersolve('cartesian_stepper_alloc', axis.encode())
         for s in self.get_steppers():
@@ -60,10 +66,13 @@ class CartKinematics:
                 toolhead.register_step_generator(s.generate_steps)
             self.dual_carriage_rails = [
                 self.rails[self.dual_carriage_axis], dc_rail]
+            self.steppers = None
             self.printer.lookup_object('gcode').register_command(
                 'SET_DUAL_CARRIAGE', self.cmd_SET_DUAL_CARRIAGE,
                 desc=self.cmd_SET_DUAL_CARRIAGE_help)
     def get_steppers(self):
+        if self.steppers is not None:
+            return self.steppers
         # NOTE: The "self.rails" list contains "PrinterRail" objects, which
         #       can have one or more stepper (PrinterStepper/MCU_stepper) objects.
         rails = self.rails
@@ -73,9 +82,10 @@ class CartKinematics:
         # NOTE: run "get_steppers" on each "PrinterRail" object from 
         #       the "self.rails" list. That method returns the list of
         #       all "PrinterStepper"/"MCU_stepper" objects in the kinematic.
-        return [s for rail in rails for s in rail.get_steppers()]
+        self.steppers = [s for rail in rails for s in rail.get_steppers()]
+        return self.steppers
     def calc_position(self, stepper_positions):
-        return [stepper_positions[rail.get_name()] for rail in self.rails]
+        return [stepper_positions[name] for name in self.rail_names]
     
     def set_position(self, newpos, homing_axes):
         logging.info("\n\n" +
@@ -109,7 +119,7 @@ class CartKinematics:
         # Determine movement
         position_min, position_max = rail.get_range()
         hi = rail.get_homing_info()
-        homepos = [None for i in range(self.toolhead_axis_count + 1)]
+        homepos = [None] * (self.toolhead_axis_count + 1)
         homepos[axis] = hi.position_endstop
         forcepos = list(homepos)
         if hi.positive_dir:
@@ -141,13 +151,14 @@ class CartKinematics:
         self.limits = [(1.0, -1.0)] * 3
     
     def _check_endstops(self, move):
-        logging.info("\n\n" + f"cartesian._check_endstops: triggered on {self.axis_names}/{self.axis} move.\n\n")
         end_pos = move.end_pos
+        axes_d = move.axes_d
+        limits = self.limits
         for i, axis in enumerate(self.axis):
-            if (move.axes_d[axis]
-                and (end_pos[axis] < self.limits[i][0]
-                     or end_pos[axis] > self.limits[i][1])):
-                if self.limits[i][0] > self.limits[i][1]:
+            low, high = limits[i]
+            if (axes_d[axis]
+                and (end_pos[axis] < low or end_pos[axis] > high)):
+                if low > high:
                     # NOTE: self.limits will be "(1.0, -1.0)" when not homed, triggering this.
                     logging.info(f"cartesian._check_endstops: Must home axis {self.axis_names[i]} first.")
                     raise move.move_error(f"Must home axis {self.axis_names[i]} first")
@@ -155,9 +166,12 @@ class CartKinematics:
                 raise move.move_error()
     
     def check_move(self, move):
+        axes_d = move.axes_d
+        if not (axes_d[0] or axes_d[1] or axes_d[2]):
+            # NOTE: Only other axes move (e.g. ABC), nothing to check here.
+            return
         limits = self.limits
-        xpos, ypos = [move.end_pos[axis] for axis in self.axis[:2]]  # move.end_pos[:2]
-        logging.info("\n\n" + f"cartesian.check_move: checking move ending on xpos={xpos} and ypos={ypos}.\n\n")
+        xpos, ypos = move.end_pos[:2]
         if (xpos < limits[0][0] or xpos > limits[0][1]
             or ypos < limits[1][0] or ypos > limits[1][1]):
             self._check_endstops(move)
@@ -179,13 +193,15 @@ class CartKinematics:
         }
     # Dual carriage support
     def _activate_carriage(self, carriage):
-        toolhead = self.printer.lookup_object('toolhead')
+        toolhead = self.toolhead
         toolhead.flush_step_generation()
         dc_rail = self.dual_carriage_rails[carriage]
         dc_axis = self.dual_carriage_axis
         self.rails[dc_axis].set_trapq(None)
         dc_rail.set_trapq(toolhead.get_trapq())
         self.rails[dc_axis] = dc_rail
+        self.rail_names[dc_axis] = dc_rail.get_name()
+        self.steppers = None
         pos = toolhead.get_position()
         pos[dc_axis] = dc_rail.get_commanded_position()
         toolhead.set_position(pos)
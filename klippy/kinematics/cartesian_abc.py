@@ -6,7 +6,6 @@
 import logging
 import stepper
 from kinematics.cartesian import CartKinematics
-from copy import deepcopy
 
 class CartKinematicsABC(CartKinematics):
     """Kinematics for the ABC axes in the main toolhead class.
@@ -39,10 +38,10 @@ class CartKinematicsABC(CartKinematics):
             axis_set_letters (str, optional): Configured set of letter axes IDs. Can have length less than 3. Defaults to "AB".
         """
         self.printer = config.get_printer()
-        
+        self.toolhead = toolhead
         
         # Configured set of axes (indexes) and their letter IDs. Can have length less or equal to 3.
-        self.axis_config = deepcopy(axes_ids)  # list of length <= 3: [0, 1, 3], [3, 4], [3, 4, 5], etc.
+        self.axis_config = tuple(axes_ids)  # tuple of length <= 3: (0, 1, 3), (3, 4), (3, 4, 5), etc.
         self.axis_names = axis_set_letters  # char of length <= 3: "XYZ", "AB", "ABC", etc.
         self.axis_count = len(self.axis_names)
 
@@ -72,10 +71,6 @@ class CartKinematicsABC(CartKinematics):
             # Else use the provided trapq object.
             self.trapq = trapq
         
-        # Setup axis rails. DISABLED!
-        # self.dual_carriage_axis = None
-        # self.dual_carriage_rails = []
-        
         # NOTE: A "PrinterRail" is setup by LookupMultiRail, per each 
         #       of the three axis, including their corresponding endstops.
         #       We do this by looking for "[stepper_?]" sections in the config.
@@ -83,6 +78,12 @@ class CartKinematicsABC(CartKinematics):
         #       can have one or more stepper (PrinterStepper/MCU_stepper) objects.
         self.rails = [stepper.LookupMultiRail(config.getsection('stepper_' + n))
                       for n in self.axis_names.lower()]
+        # NOTE: list of steppers, built by "get_steppers" when needed.
+        self.steppers = None
+        # NOTE: names of the rails, used by "calc_position".
+        self.rail_names = [rail.get_name() for rail in self.rails]
+        # NOTE: rail of each toolhead axis index, used by "home".
+        self.axis_rails = dict(zip(self.axis_config, self.rails))
         
         # NOTE: "xyz_axis_names" must always be "xyz" and not "abc", 
         #       see "cartesian_stepper_alloc" in C code.
@@ -127,23 +128,9 @@ class CartKinematicsABC(CartKinematics):
         # TODO: Check that this works with ABC axes, it will result in 
         #       "Coord(x=1.0, y=0.0, z=0.0, e=0.0, a=None, b=None, c=None)"
         #       "Coord(x=-1.0, y=-1.0, z=-1.0, e=0.0, a=None, b=None, c=None)"
-        self.axes_min = toolhead.Coord(*[r[0] for r in ranges], e=0.)
-        self.axes_max = toolhead.Coord(*[r[1] for r in ranges], e=0.)
-        
-        # Check for dual carriage support
-        # if config.has_section('dual_carriage'):
-        #     dc_config = config.getsection('dual_carriage')
-        #     dc_axis = dc_config.getchoice('axis', {'x': 'x', 'y': 'y'})
-        #     self.dual_carriage_axis = {'x': 0, 'y': 1}[dc_axis]
-        #     dc_rail = stepper.LookupMultiRail(dc_config)
-        #     dc_rail.setup_itersolve('cartesian_stepper_alloc', dc_axis.encode())
-        #     for s in dc_rail.get_steppers():
-        #         toolhead.register_step_generator(s.generate_steps)
-        #     self.dual_carriage_rails = [
-        #         self.rails[self.dual_carriage_axis], dc_rail]
-        #     self.printer.lookup_object('gcode').register_command(
-        #         'SET_DUAL_CARRIAGE', self.cmd_SET_DUAL_CARRIAGE,
-        #         desc=self.cmd_SET_DUAL_CARRIAGE_help)
+        range_mins, range_maxs = zip(*ranges)
+        self.axes_min = toolhead.Coord(*range_mins, e=0.)
+        self.axes_max = toolhead.Coord(*range_maxs, e=0.)
     
     def reset_limits(self):
         # self.limits = [(1.0, -1.0)] * len(self.axis_config)
@@ -152,40 +139,40 @@ class CartKinematicsABC(CartKinematics):
         #       See "get_status" for more details.
         # NOTE: Using length 3
         self.limits = [(1.0, -1.0)] * 3
+        # NOTE: "homed_axes" string for "get_status", built when requested
+        #       and reset to None whenever the limits change.
+        self.homed_axes = None
         # NOTE: I've got all of the (internal) calls covered.
         #       There may be other uses of the "limits" attribute elsewhere.
     
     def get_steppers(self):
+        if self.steppers is not None:
+            return self.steppers
         # NOTE: The "self.rails" list contains "PrinterRail" objects, which
         #       can have one or more stepper (PrinterStepper/MCU_stepper) objects.
         rails = self.rails
         
-        # if self.dual_carriage_axis is not None:
-        #     dca = self.dual_carriage_axis
-        #     rails = rails[:dca] + self.dual_carriage_rails + rails[dca+1:]
-        
         # NOTE: run "get_steppers" on each "PrinterRail" object from 
         #       the "self.rails" list. That method returns the list of
         #       all "PrinterStepper"/"MCU_stepper" objects in the kinematic.
-        return [s for rail in rails for s in rail.get_steppers()]
+        self.steppers = [s for rail in rails for s in rail.get_steppers()]
+        return self.steppers
     
     def calc_position(self, stepper_positions):
-        return [stepper_positions[rail.get_name()] for rail in self.rails]
+        return [stepper_positions[name] for name in self.rail_names]
     
     def set_position(self, newpos, homing_axes):
-        logging.info("\n\n" +
-                     f"CartKinematicsABC.set_position: setting kinematic position of {len(self.rails)} rails " +
-                     f"with newpos={newpos} and homing_axes={homing_axes}\n\n")
+        homing_axes = frozenset(homing_axes)
+        limits = self.limits
         for i, rail in enumerate(self.rails):
-            logging.info(f"\n\nCartKinematicsABC: setting newpos={newpos} on stepper: {rail.get_name()}\n\n")
             rail.set_position(newpos)
             if i in homing_axes:
-                logging.info(f"\n\nCartKinematicsABC: setting limits={rail.get_range()} on stepper: {rail.get_name()}\n\n")
                 # NOTE: Here each limit becomes associated to a certain "rail" (i.e. an axis).
                 #       If the rails were set up as "XYZ" in that order (as per "self.axis_names"),
                 #       the limits will now correspond to them in that same order.
                 # NOTE: This is relevant fot "get_status".
-                self.limits[i] = rail.get_range()
+                limits[i] = rail.get_range()
+                self.homed_axes = None
     
     def note_z_not_homed(self):
         # Helper for Safe Z Home
@@ -198,7 +185,7 @@ class CartKinematicsABC(CartKinematics):
         # Determine movement
         position_min, position_max = rail.get_range()
         hi = rail.get_homing_info()
-        homepos = [None for i in range(self.toolhead_axis_count + 1)]
+        homepos = [None] * (self.toolhead_axis_count + 1)
         homepos[axis] = hi.position_endstop
         forcepos = list(homepos)
         if hi.positive_dir:
@@ -211,18 +198,20 @@ class CartKinematicsABC(CartKinematics):
     
     def home(self, homing_state):
         # Each axis is homed independently and in order
-        toolhead = self.printer.lookup_object('toolhead')
+        axis_rails = self.axis_rails
         for axis in homing_state.get_axes():
             # NOTE: support for dual carriage removed.
-            self._home_axis(homing_state, axis, self.rails[toolhead.axes_to_xyz(axis)])
+            self._home_axis(homing_state, axis, axis_rails[axis])
     
     def _motor_off(self, print_time):
         self.reset_limits()
     
     def _check_endstops(self, move):
-        logging.info("\n\n" + f"cartesian_abc._check_endstops: triggered on {self.axis_names}/{self.axis} move.\n\n")
         end_pos = move.end_pos
-        for i, axis in enumerate(self.axis_config):
+        axes_d = move.axes_d
+        limits = self.limits
+        axis_config = self.axis_config
+        for i, axis in enumerate(axis_config):
             # TODO: Check if its better to iterate over "self.axis" instead,
             #       which is forced to lenght 3. For now "self.axis_config"
             #       seems more reasonable, as it will be the toolhead passing
@@ -230,14 +219,14 @@ class CartKinematicsABC(CartKinematics):
             #       indices for this kinematic during setup in the first place.
             #       Furthermore, limits are ordered by "self.axis_names", which
             #       correlates 1:1 with "self.axis_config".
-            if (move.axes_d[axis]
-                and (end_pos[axis] < self.limits[i][0]
-                     or end_pos[axis] > self.limits[i][1])):
-                if self.limits[i][0] > self.limits[i][1]:
+            low, high = limits[i]
+            pos = end_pos[axis]
+            if axes_d[axis] and (pos < low or pos > high):
+                if low > high:
                     # NOTE: self.limits will be "(1.0, -1.0)" when not homed, triggering this.
                     msg = "".join(["\n\n" + f"cartesian_abc._check_endstops: Must home axis {self.axis_names[i]} first,",
-                                   f"limits={self.limits[i]} end_pos[axis]={end_pos[axis]} ",
-                                   f"move.axes_d[axis]={move.axes_d[axis]}" + "\n\n"])
+                                   f"limits={limits[i]} end_pos[axis]={pos} ",
+                                   f"move.axes_d[axis]={axes_d[axis]}" + "\n\n"])
                     logging.info(msg)
                     raise move.move_error(f"Must home axis {self.axis_names[i]} first")
                 raise move.move_error()
@@ -253,14 +242,26 @@ class CartKinematicsABC(CartKinematics):
         Args:
             move (tolhead.Move): Instance of the Move class.
         """
-        limit_checks = []
-        for i, axis in enumerate(self.axis_config):
+        axis_config = self.axis_config
+        axes_d = move.axes_d
+        for axis in axis_config:
+            if axes_d[axis]:
+                break
+        else:
+            # NOTE: None of the axes of this kinematic move (e.g. an XYZ
+            #       move on an XYZABC toolhead), nothing to check here.
+            return
+        end_pos = move.end_pos
+        limits = self.limits
+        for i, axis in enumerate(axis_config):
             # TODO: Check if its better to iterate over "self.axis" instead,
             #       see rationale in favor of "axis_config" above, at "_check_endstops".
-            pos = move.end_pos[axis]
-            limit_checks.append(pos < self.limits[i][0] or pos > self.limits[i][1])
-        if any(limit_checks):
-            self._check_endstops(move)
+            # NOTE: stop at the first axis out of its limits.
+            low, high = limits[i]
+            pos = end_pos[axis]
+            if pos < low or pos > high:
+                self._check_endstops(move)
+                break
         
         # limits = self.limits
         # apos, bpos = [move.end_pos[axis] for axis in self.axis[:2]]  # move.end_pos[3:6]
@@ -269,8 +270,6 @@ class CartKinematicsABC(CartKinematics):
         #     or bpos < limits[1][0] or bpos > limits[1][1]):
         #     self._check_endstops(move)
         
-        self._check_endstops(move)
-        
         # TODO: Reconsider adding Z-axis speed limiting.
         # # NOTE: check if the move involves the Z axis, to limit the speed.
         # if not move.axes_d[self.axis[2]]:
@@ -290,31 +289,15 @@ class CartKinematicsABC(CartKinematics):
         # NOTE: "zip" will iterate until one of the arguments runs out.
         #       This means that having "XY" axis names is not problematic
         #       when self.limits is length 3, and viceversa.
-        axes = [a for a, (l, h) in zip(self.axis_names.lower(), self.limits) if l <= h]
+        homed_axes = self.homed_axes
+        if homed_axes is None:
+            axes = [a for a, (l, h) in zip(self.axis_names.lower(), self.limits) if l <= h]
+            self.homed_axes = homed_axes = "".join(axes)
         return {
-            'homed_axes': "".join(axes),
+            'homed_axes': homed_axes,
             'axis_minimum': self.axes_min,
             'axis_maximum': self.axes_max,
         }
-    
-    # Dual carriage support
-    # def _activate_carriage(self, carriage):
-    #     toolhead = self.printer.lookup_object('toolhead')
-    #     toolhead.flush_step_generation()
-    #     dc_rail = self.dual_carriage_rails[carriage]
-    #     dc_axis = self.dual_carriage_axis
-    #     self.rails[dc_axis].set_trapq(None)
-    #     dc_rail.set_trapq(toolhead.get_trapq())
-    #     self.rails[dc_axis] = dc_rail
-    #     pos = toolhead.get_position()
-    #     pos[dc_axis] = dc_rail.get_commanded_position()
-    #     toolhead.set_position(pos)
-    #     if self.limits[dc_axis][0] <= self.limits[dc_axis][1]:
-    #         self.limits[dc_axis] = dc_rail.get_range()
-    # cmd_SET_DUAL_CARRIAGE_help = "Set which carriage is active"
-    # def cmd_SET_DUAL_CARRIAGE(self, gcmd):
-    #     carriage = gcmd.get_int('CARRIAGE', minval=0, maxval=1)
-    #     self._activate_carriage(carriage)
 
 def load_kinematics(toolhead, config, trapq=None, axes_ids=(0, 1, 2), axis_set_letters="XYZ"):
     return CartKinematicsABC(toolhead, config, trapq, axes_ids, axis_set_letters)
@@ -26,5 +26,5 @@ class NoneKinematics:
             'axis_maximum': self.axes_minmax,
         }
 
-def load_kinematics(toolhead, config, trapq):
+def load_kinematics(toolhead, config, trapq, axes_ids=(0, 1, 2), axis_set_letters="XYZ"):
     return NoneKinematics(toolhead, config, trapq)
@@ -211,8 +211,6 @@ class MoveQueue:
         Args:
             lazy (bool, optional): _description_. Defaults to False.
         """
-        # NOTE: logging for tracing activity
-        logging.info("\n\nMoveQueue flush: function triggered.\n\n")
         # NOTE: called by "add_move" when: 
         #       "Enough moves have been queued to reach the target flush time."
         #       Also called by "flush_step_generation".
@@ -308,17 +306,21 @@ class MoveQueue:
         #       which can happen if the queue was originally empty (¿or perhaps if
         #       the peak cruise speed was found on the second move?).
         if update_flush_count or not flush_count:
-            logging.info(f"\n\nMoveQueue flush: _process_moves skipped due to update_flush_count={update_flush_count} or not flush_count={flush_count}\n\n")
             return
         
         # Generate step times for all moves ready to be flushed
         # NOTE: The clock time when these moves will be executed is not yet explicit,
         #       it will be calculated  by "_process_moves", and then updated with
         #       a call to "_update_move_time".
-        logging.info("\n\nMoveQueue flush: calling _process_moves.\n\n")
         # NOTE: "flush_count" can only have been made possibly smaller by 
         #       setting "lazy=True" from the start. This means that a "regular"
         #       call to flush will try to remove all
+        if flush_count == len(queue):
+            # NOTE: All moves are flushed, hand over the whole list instead
+            #       of copying it, and start a new (empty) queue.
+            self.queue = []
+            self.toolhead._process_moves(moves=queue)
+            return
         self.toolhead._process_moves(moves=queue[:flush_count])
 
         # Remove processed moves from the queue
@@ -330,7 +332,6 @@ class MoveQueue:
         Args:
             move (Move): A new Move object.
         """
-        logging.info(f"\n\nMoveQueue.add_move: adding move.\n\n")
         self.queue.append(move)
         
         # NOTE: The move queue is not flushed automatically when the 